@@ -0,0 +1,162 @@
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+
+import degrees
+
+# Number of queries read and grouped by source at a time
+CHUNK = 10000
+
+# Non-interactive ways of picking between people who share a name
+RESOLVERS = {
+    "error": degrees.skip_ambiguous,
+    "most-credited": degrees.most_credited
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Answer many degrees-of-separation queries, one JSON line each."
+    )
+    parser.add_argument("directory", help="directory with people.csv, movies.csv and stars.csv")
+    parser.add_argument("queries", nargs="?", default="-",
+                        help="CSV of source,target names or person ids (default: stdin)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1,
+                        help="number of worker processes (default: one per CPU)")
+    parser.add_argument("--ambiguous", choices=sorted(RESOLVERS), default="error",
+                        help="how to resolve names shared by several people (default: error)")
+    args = parser.parse_args()
+
+    degrees.load_data(args.directory)
+    resolver = RESOLVERS[args.ambiguous]
+
+    if args.queries == "-":
+        run(sys.stdin, sys.stdout, args.directory, args.workers, resolver)
+    else:
+        with open(args.queries, encoding="utf-8", newline="") as f:
+            run(f, sys.stdout, args.directory, args.workers, resolver)
+
+
+def run(lines, out, directory, workers, resolver=degrees.skip_ambiguous):
+    """
+    Answer every query in `lines`, writing one JSON object per query to `out`
+    as soon as its group of queries is done.
+    """
+    if workers <= 1:
+        for chunk in read_chunks(lines, resolver):
+            for results in map(answer_group, chunk):
+                write_results(out, results)
+        return
+
+    # Forked workers inherit the already loaded (memory-mapped) graph;
+    # otherwise each worker maps the snapshot written by the parent
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else None)
+    with context.Pool(workers, initializer=start_worker, initargs=(directory,)) as pool:
+        for chunk in read_chunks(lines, resolver):
+            for results in pool.imap_unordered(answer_group, chunk):
+                write_results(out, results)
+
+
+def read_chunks(lines, resolver):
+    """
+    Parse queries from `lines` and yield them `CHUNK` at a time, grouped by
+    source. Each group is (source, [(query, target), ...]) where `query` is
+    the 1-based line number; unresolvable queries come back as errors.
+    """
+    rows = enumerate(csv.reader(lines), start=1)
+    while True:
+        chunk = list(itertools.islice(rows, CHUNK))
+        if not chunk:
+            return
+        groups = {}
+        errors = []
+        for query, row in chunk:
+            if len(row) != 2:
+                errors.append(error(query, row, "expected source,target"))
+                continue
+            source, target = resolve(row[0], resolver), resolve(row[1], resolver)
+            if source is None or target is None:
+                unresolved = row[0] if source is None else row[1]
+                errors.append(error(
+                    query, row, f"'{unresolved}' not found or ambiguous",
+                    degrees.name_index.candidates(unresolved.strip(), limit=5)
+                ))
+                continue
+            groups.setdefault(source, []).append((query, target))
+        yield [(None, errors)] + list(groups.items())
+
+
+def resolve(value, resolver):
+    """
+    Return the person_id for `value`, which may be a person_id or a name
+    (shared names are settled by `resolver`), or None.
+    """
+    value = value.strip()
+    if degrees.graph.person_index(value) is not None:
+        return value
+    return degrees.person_id_for_name(value, resolve=resolver)
+
+
+def error(query, row, message, candidates=None):
+    line = {"query": query, "input": row, "error": message}
+    if candidates:
+        line["candidates"] = candidates
+    return line
+
+
+def start_worker(directory):
+    if not degrees.graph.person_ids:
+        degrees.load_data(directory)
+
+
+def answer_group(group):
+    """
+    Answer all queries sharing one source. A single query uses the
+    bidirectional search; several share one breadth-first tree.
+    """
+    source, queries = group
+    if source is None:
+        return queries
+
+    results = []
+    if len(queries) == 1:
+        query, target = queries[0]
+        results.append(result(query, source, target, degrees.shortest_path(source, target)))
+        return results
+
+    graph = degrees.graph
+    parents = degrees.breadth_first_tree(
+        graph.person_index(source),
+        [graph.person_index(target) for _, target in queries]
+    )
+    for query, target in queries:
+        path = degrees.tree_path(parents, graph.person_index(target))
+        if path is not None:
+            path = [(graph.movie_ids[movie], graph.person_ids[person]) for movie, person in path]
+        results.append(result(query, source, target, path))
+    return results
+
+
+def result(query, source, target, path):
+    return {
+        "query": query,
+        "source": source,
+        "target": target,
+        "degrees": None if path is None else len(path),
+        "path": path
+    }
+
+
+def write_results(out, results):
+    for line in results:
+        out.write(json.dumps(line) + "\n")
+    out.flush()
+
+
+if __name__ == "__main__":
+    main()
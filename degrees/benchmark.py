@@ -0,0 +1,225 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+import degrees
+
+# Number of star rows generated for each named dataset size
+SCALES = {
+    "small": 1000,
+    "medium": 100000,
+    "large": 1000000,
+    "huge": 5000000
+}
+
+# Shape of the generated data, roughly matching the IMDb exports
+PEOPLE_PER_STAR = 0.8
+STARS_PER_MOVIE = 4
+CREDITS_SKEW = 3
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark degrees loading and search on synthetic IMDb-shaped data."
+    )
+    parser.add_argument("scales", nargs="*", default=["small", "medium"],
+                        help=f"dataset sizes: {', '.join(SCALES)} or a number of stars")
+    parser.add_argument("--queries", type=int, default=200, help="source/target pairs per scale")
+    parser.add_argument("--seed", type=int, default=0, help="seed for data and query generation")
+    parser.add_argument("--modes", nargs="+", default=["bidirectional"],
+                        choices=["bidirectional", "bfs"], help="search modes to run")
+    parser.add_argument("--data", help="directory to keep generated datasets in (default: temporary)")
+    parser.add_argument("--output", default="benchmark.json", help="JSON file for the results")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary:
+        data = args.data or temporary
+        results = []
+        for scale in args.scales:
+            stars = SCALES[scale] if scale in SCALES else int(scale)
+            directory = os.path.join(data, f"{scale}-{args.seed}")
+            if not os.path.exists(os.path.join(directory, "stars.csv")):
+                print(f"Generating {scale} dataset ({stars} stars)...", file=sys.stderr)
+                generate(directory, stars, args.seed)
+
+            # Smaller scales loaded earlier would otherwise set this one's peak RSS
+            print(f"Benchmarking {scale}...", file=sys.stderr)
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(1) as pool:
+                result = pool.apply(run, (directory, args.queries, args.seed, args.modes))
+            result["scale"] = scale
+            results.append(result)
+            report(result)
+
+    output = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seed": args.seed,
+        "queries": args.queries,
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), output)
+
+
+def generate(directory, stars, seed):
+    """
+    Write people.csv, movies.csv and stars.csv with about `stars` star rows
+    to `directory`. People are drawn with a skew towards low ids, so a few
+    have many credits and most have one or two.
+    """
+    rng = random.Random(seed)
+    people = max(2, int(stars * PEOPLE_PER_STAR))
+    movies = max(1, stars // STARS_PER_MOVIE)
+    os.makedirs(directory, exist_ok=True)
+
+    with open(os.path.join(directory, "people.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for person in range(people):
+            birth = rng.randint(1900, 2005) if rng.random() < 0.7 else ""
+            writer.writerow([person + 1, f"Person {person + 1}", birth])
+
+    with open(os.path.join(directory, "movies.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for movie in range(movies):
+            writer.writerow([movie + 1, f"Movie {movie + 1}", rng.randint(1920, 2022)])
+
+    with open(os.path.join(directory, "stars.csv"), "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for _ in range(stars):
+            person = int(people * rng.random() ** CREDITS_SKEW) + 1
+            writer.writerow([person, rng.randint(1, movies)])
+
+
+def run(directory, queries, seed, modes):
+    """
+    Load `directory` and time `queries` seeded source/target searches for
+    each of `modes`. Returns a dictionary of measurements.
+    """
+    for name in os.listdir(directory):
+        if name.endswith(".snapshot"):
+            os.remove(os.path.join(directory, name))
+
+    start = time.perf_counter()
+    degrees.load_data(directory)
+    load_csv = time.perf_counter() - start
+    start = time.perf_counter()
+    degrees.load_data(directory)
+    load_snapshot = time.perf_counter() - start
+
+    graph = degrees.graph
+    rng = random.Random(seed)
+    size = len(graph.person_ids)
+    pairs = [
+        (graph.person_ids[rng.randrange(size)], graph.person_ids[rng.randrange(size)])
+        for _ in range(queries)
+    ]
+
+    result = {
+        "people": size,
+        "movies": len(graph.movie_ids),
+        "stars": len(graph.person_movies),
+        "load_csv_seconds": load_csv,
+        "load_snapshot_seconds": load_snapshot,
+        "modes": {}
+    }
+    for mode in modes:
+        latencies = []
+        expanded = []
+        lengths = []
+        for source, target in pairs:
+            graph.expanded = 0
+            start = time.perf_counter()
+            path = degrees.shortest_path(source, target, bidirectional=(mode == "bidirectional"))
+            latencies.append((time.perf_counter() - start) * 1000)
+            expanded.append(graph.expanded)
+            if path is not None:
+                lengths.append(len(path))
+        result["modes"][mode] = {
+            "latency_ms": percentiles(latencies),
+            "expanded": percentiles(expanded),
+            "connected": len(lengths),
+            "mean_degrees": statistics.mean(lengths) if lengths else None
+        }
+
+    # macOS reports ru_maxrss in bytes, Linux in kilobytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    result["peak_rss_mb"] = peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+    return result
+
+
+def percentiles(values):
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+
+    def at(fraction):
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    return {
+        "mean": statistics.mean(ordered),
+        "p50": at(0.5),
+        "p90": at(0.9),
+        "p99": at(0.99),
+        "max": ordered[-1]
+    }
+
+
+def report(result):
+    print(f"{result['scale']}: {result['people']} people, {result['movies']} movies, "
+          f"{result['stars']} stars")
+    print(f"  load: {result['load_csv_seconds']:.3f}s from CSV, "
+          f"{result['load_snapshot_seconds'] * 1000:.1f}ms from snapshot, "
+          f"peak RSS {result['peak_rss_mb']:.0f} MB")
+    for mode, measured in result["modes"].items():
+        latency = measured["latency_ms"]
+        print(f"  {mode}: p50 {latency['p50']:.2f}ms, p90 {latency['p90']:.2f}ms, "
+              f"p99 {latency['p99']:.2f}ms, mean expanded {measured['expanded']['mean']:.0f}")
+
+
+def compare(before, after):
+    """
+    Print how each scale's headline numbers changed between two result files.
+    """
+    previous = {result["scale"]: result for result in before["results"]}
+    print("Change against earlier results (after / before):")
+    for result in after["results"]:
+        old = previous.get(result["scale"])
+        if old is None:
+            continue
+        print(f"  {result['scale']}:")
+        for key in ["load_csv_seconds", "load_snapshot_seconds", "peak_rss_mb"]:
+            print(f"    {key}: {ratio(result[key], old[key])}")
+        for mode, measured in result["modes"].items():
+            if mode not in old["modes"]:
+                continue
+            for key in ["latency_ms", "expanded"]:
+                print(f"    {mode} {key} p50: "
+                      f"{ratio(measured[key]['p50'], old['modes'][mode][key]['p50'])}")
+
+
+def ratio(new, old):
+    return f"{new / old:.2f}x" if old else "n/a"
+
+
+if __name__ == "__main__":
+    main()
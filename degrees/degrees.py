@@ -1,57 +1,45 @@
-import csv
 import sys
 
-from sqlalchemy import ForeignKeyConstraint
-
+from graph import NEIGHBOR_CACHE_BYTES, Graph, MoviesView, NamesView, PeopleView
+from hubs import HubIndex
+from lookup import NameIndex
 from util import Node, StackFrontier, QueueFrontier
 
+# Integer-indexed people/movies graph that the lookups below are views over
+graph = Graph()
+
 # Maps names to a set of corresponding person_ids
-names = {}
+names = NamesView(graph)
 
 # Maps person_ids to a dictionary of: name, birth, movies (a set of movie_ids)
-people = {}
+people = PeopleView(graph)
 
 # Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
-movies = {}
+movies = MoviesView(graph)
+
+# Ranked exact, prefix and fuzzy name lookups (see lookup.py)
+name_index = NameIndex(graph)
 
+# Precomputed breadth-first trees from hub people (see hubs.py)
+hub_index = HubIndex()
 
-def load_data(directory):
+
+def load_data(directory, snapshot=True, costars=False, cache_bytes=NEIGHBOR_CACHE_BYTES,
+              min_year=None, min_credits=None, progress=None):
     """
     Load data from CSV files into memory.
+
+    The parsed graph is cached in a binary snapshot next to the CSV files
+    and memory-mapped on later runs until one of the CSV files changes.
+    `costars` precomputes deduplicated co-star lists for every person;
+    otherwise they are built on demand and cached up to `cache_bytes`.
+    `min_year` and `min_credits` load only a subgraph, and `progress` is
+    called with running row counts while stars.csv is parsed.
     """
-    # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
-
-    # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
-
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    graph.load(directory, snapshot=snapshot, costars=costars, cache_bytes=cache_bytes,
+               min_year=min_year, min_credits=min_credits, progress=progress)
+    hub_index.load(directory, graph)
+    name_index.clear()
 
 
 def main():
@@ -61,8 +49,12 @@ def main():
 
     # Load data from files into memory
     print("Loading data...")
-    load_data(directory)
+    load_data(directory, progress=print_progress)
     print("Data loaded.")
+    stats = graph.load_stats
+    if stats.get("skipped") or stats.get("orphaned"):
+        print(f"Ignored {stats['skipped']} malformed and {stats['orphaned']} orphaned star rows.",
+              file=sys.stderr)
 
     source = person_id_for_name(input("Name: "))
     if source is None:
@@ -86,12 +78,48 @@ def main():
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def print_progress(stats):
+    print(f"  {stats['rows']} star rows read...", end="\r", file=sys.stderr)
+
+
+def shortest_path(source, target, bidirectional=True):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
     If no possible path, returns None.
+
+    By default the search grows from both ends and meets in the middle;
+    pass `bidirectional=False` for a plain breadth-first search from source.
+    When either person is an indexed hub the path is read off its tree, and
+    otherwise the best route through a hub bounds the search.
+    """
+    source = graph.person_index(source)
+    target = graph.person_index(target)
+    if source is None or target is None:
+        return None
+
+    if source in hub_index or target in hub_index:
+        path = hub_index.path(source, target)
+    elif bidirectional:
+        if hub_index.separates(source, target):
+            return None
+        route = hub_index.route(source, target)
+        path = bidirectional_path(source, target, None if route is None else len(route))
+        if path is None:
+            path = route
+    else:
+        path = breadth_first_path(source, target)
+    if path is None:
+        return None
+
+    return [(graph.movie_ids[movie], graph.person_ids[person]) for movie, person in path]
+
+
+def breadth_first_path(source, target):
+    """
+    Plain breadth-first search from `source` over person indices.
+    Returns a list of (movie, person) index pairs, or None.
     """
     start = Node(state=source, parent=None, action=None) #action will be movie ID in later stages 
     frontier = QueueFrontier()
@@ -111,13 +139,133 @@ def shortest_path(source, target):
         explored.add(node.state)
 
         #finding the next nodes
-        for action, state in neighbors_for_person(node.state):
+        for action, state in graph.neighbors(node.state):
                 if not frontier.contains_state(state) and state not in explored:
                     child = Node(state=state, parent=node, action=action)
                     if child.state == target:
                         return getPath(child) 
                     frontier.add(child)
 
+def bidirectional_path(source, target, limit=None):
+    """
+    Breadth-first search grown one layer at a time from both the source
+    and the target, always expanding the smaller frontier, until the two
+    searches reach a common person.
+
+    Works on person indices and returns a list of (movie, person)
+    index pairs, or None. With a `limit`, also gives up (returning None)
+    as soon as no path shorter than `limit` can exist.
+    """
+    if source == target:
+        return []
+
+    # Maps every reached person to the (movie, person) step leading back
+    # towards the side's root (None for the root itself)
+    forward = {source: None}
+    backward = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    # Sum of both searches' depths; the next meeting has length depth + 1
+    depth = 0
+    while forward_frontier and backward_frontier:
+        if limit is not None and depth + 1 >= limit:
+            return None
+        depth += 1
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meeting = expand_layer(forward_frontier, forward, backward)
+        else:
+            backward_frontier, meeting = expand_layer(backward_frontier, backward, forward)
+        if meeting is not None:
+            return join_paths(meeting, forward, backward)
+
+    return None
+
+
+def expand_layer(frontier, parents, others):
+    """
+    Expand every person in `frontier` by one step, recording new people in
+    `parents`. Returns the next frontier and the first person also reached
+    by the opposite search (`others`), or None if the searches haven't met.
+
+    The two searches stay disjoint until they meet, so the first meeting
+    found in a layer already lies on a shortest path.
+    """
+    next_frontier = []
+    for person in frontier:
+        for movie, neighbor in graph.neighbors(person):
+            if neighbor in parents:
+                continue
+            parents[neighbor] = (movie, person)
+            if neighbor in others:
+                return next_frontier, neighbor
+            next_frontier.append(neighbor)
+    return next_frontier, None
+
+
+def join_paths(meeting, forward, backward):
+    """
+    Stitch the forward search (source -> meeting) and the backward search
+    (meeting -> target) into a single list of (movie, person) pairs.
+    """
+    path = []
+    person = meeting
+    while forward[person] is not None:
+        movie, previous = forward[person]
+        path.append((movie, person))
+        person = previous
+    path.reverse()
+
+    person = meeting
+    while backward[person] is not None:
+        movie, following = backward[person]
+        path.append((movie, following))
+        person = following
+
+    return path
+
+
+def breadth_first_tree(source, targets=()):
+    """
+    Breadth-first search from person index `source` that keeps going until
+    every index in `targets` has been reached (or the component runs out),
+    so one search can answer many queries sharing a source.
+
+    Returns a dict mapping every reached person to its (movie, person)
+    parent step, with None for the source itself.
+    """
+    parents = {source: None}
+    remaining = set(targets) - {source}
+    frontier = [source]
+    while frontier and remaining:
+        next_frontier = []
+        for person in frontier:
+            for movie, neighbor in graph.neighbors(person):
+                if neighbor in parents:
+                    continue
+                parents[neighbor] = (movie, person)
+                remaining.discard(neighbor)
+                next_frontier.append(neighbor)
+        frontier = next_frontier
+    return parents
+
+
+def tree_path(parents, target):
+    """
+    Returns the (movie, person) index path from the root of a
+    `breadth_first_tree` to `target`, or None if it wasn't reached.
+    """
+    if target not in parents:
+        return None
+    path = []
+    while parents[target] is not None:
+        movie, parent = parents[target]
+        path.append((movie, target))
+        target = parent
+    path.reverse()
+    return path
+
+
 def getPath(node):
     path = []
     
@@ -129,42 +277,68 @@ def getPath(node):
     return path
 
 
-def person_id_for_name(name):
+def person_id_for_name(name, resolve=None):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
+
+    When several people share the name, `resolve(name, person_ids)` picks
+    one (or returns None); by default the user is asked on stdin.
     """
     person_ids = list(names.get(name.lower(), set()))
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
-        print(f"Which '{name}'?")
-        for person_id in person_ids:
-            person = people[person_id]
-            name = person["name"]
-            birth = person["birth"]
-            print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
-        try:
-            person_id = input("Intended Person ID: ")
-            if person_id in person_ids:
-                return person_id
-        except ValueError:
-            pass
-        return None
+        if resolve is None:
+            resolve = ask_person_id
+        return resolve(name, person_ids)
     else:
         return person_ids[0]
 
 
+def ask_person_id(name, person_ids):
+    """
+    Interactive resolver: list the candidates and ask which one is meant.
+    """
+    print(f"Which '{name}'?")
+    for person_id in person_ids:
+        person = people[person_id]
+        name = person["name"]
+        birth = person["birth"]
+        print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
+    try:
+        person_id = input("Intended Person ID: ")
+        if person_id in person_ids:
+            return person_id
+    except ValueError:
+        pass
+    return None
+
+
+def most_credited(name, person_ids):
+    """
+    Non-interactive resolver: pick the person with the most movies.
+    """
+    return max(person_ids, key=lambda person_id: graph.credits(graph.person_index(person_id)))
+
+
+def skip_ambiguous(name, person_ids):
+    """
+    Non-interactive resolver: refuse to guess between several people.
+    """
+    return None
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
-    movie_ids = people[person_id]["movies"]
+    person = graph.person_index(person_id)
     neighbors = set()
-    for movie_id in movie_ids:
-        for person_id in movies[movie_id]["stars"]:
-            neighbors.add((movie_id, person_id))
+    for movie in graph.movies_of(person):
+        for star in graph.stars_of(movie):
+            neighbors.add((graph.movie_ids[movie], graph.person_ids[star]))
     return neighbors
 
 
@@ -0,0 +1,682 @@
+import csv
+import itertools
+import json
+import mmap
+import os
+import sys
+from array import array
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import Mapping, Sequence
+
+# Typecodes for person/movie indices and for offsets into adjacency arrays
+INDEX = "i"
+OFFSET = "q"
+
+# Binary snapshot of the parsed graph, written next to the CSV files
+SNAPSHOT = "degrees.snapshot"
+SNAPSHOT_MAGIC = b"DEGREES\x00"
+SNAPSHOT_VERSION = 2
+SOURCES = ["people.csv", "movies.csv", "stars.csv"]
+
+# Number of stars.csv rows parsed at a time
+STAR_CHUNK = 100000
+
+# Default memory budget for cached co-star lists
+NEIGHBOR_CACHE_BYTES = 64 * 1024 * 1024
+
+# Graph attributes stored in a snapshot, as integer arrays, optional
+# precomputed co-star arrays, or string tables
+ARRAYS = ["name_order", "person_offsets", "person_movies", "movie_offsets", "movie_stars"]
+COSTARS = ["costar_offsets", "costar_movies", "costar_people"]
+STRINGS = ["person_ids", "person_names", "person_births", "movie_ids", "movie_titles", "movie_years"]
+
+
+class Graph():
+    """
+    Compact bipartite graph of people and movies.
+
+    People and movies are remapped to dense integer indices (in sorted order
+    of their IMDb id, so ids can be found with a binary search) and the
+    star relation is stored twice in CSR form: `person_offsets` and
+    `person_movies` list the movies of every person, `movie_offsets` and
+    `movie_stars` list the people of every movie.
+    """
+
+    def __init__(self):
+        self.person_ids = StringTable()
+        self.person_names = StringTable()
+        self.person_births = StringTable()
+        self.movie_ids = StringTable()
+        self.movie_titles = StringTable()
+        self.movie_years = StringTable()
+
+        # Person indices ordered by lowercase name, for name lookups
+        self.name_order = array(INDEX)
+
+        self.person_offsets = array(OFFSET, [0])
+        self.person_movies = array(INDEX)
+        self.movie_offsets = array(OFFSET, [0])
+        self.movie_stars = array(INDEX)
+
+        # Optional CSR of deduplicated co-stars: for every person, each
+        # co-star once, with one representative movie they share
+        self.costar_offsets = None
+        self.costar_movies = None
+        self.costar_people = None
+
+        # Co-star lists computed on demand when the CSR above isn't built
+        self.neighbor_cache = NeighborCache(NEIGHBOR_CACHE_BYTES)
+
+        # Number of people expanded by searches so far, for benchmarking
+        self.expanded = 0
+
+        # Subgraph filters the graph was loaded with, and the row counts
+        # (loaded, skipped, orphaned, filtered) from reading stars.csv
+        self.filters = {}
+        self.load_stats = {}
+
+        # Memory map backing the arrays when loaded from a snapshot
+        self.snapshot = None
+
+    def load(self, directory, snapshot=True, costars=False, cache_bytes=NEIGHBOR_CACHE_BYTES,
+             min_year=None, min_credits=None, progress=None):
+        """
+        Load the graph for `directory`, memory-mapping its snapshot when it
+        is up to date with the CSV files. Otherwise parse the CSV files and,
+        if `snapshot` is set, write a fresh snapshot for the next run.
+
+        With `costars`, the deduplicated co-star adjacency is precomputed
+        (and stored in the snapshot); otherwise co-star lists are computed
+        on demand and kept in an LRU cache of at most `cache_bytes`.
+
+        `min_year`, `min_credits` and `progress` are passed to `read_csv`;
+        filtered graphs get their own snapshot.
+        """
+        self.neighbor_cache = NeighborCache(cache_bytes)
+        filters = {}
+        if min_year is not None:
+            filters["min_year"] = min_year
+        if min_credits is not None:
+            filters["min_credits"] = min_credits
+        path = os.path.join(directory, snapshot_name(filters))
+        sources = source_stats(directory)
+        if snapshot and self.read_snapshot(path, sources, filters):
+            if not costars or self.costar_offsets is not None:
+                return
+            self.build_costars()
+        else:
+            self.read_csv(directory, min_year, min_credits, progress)
+            if costars:
+                self.build_costars()
+        if snapshot:
+            try:
+                self.write_snapshot(path, sources)
+            except OSError:
+                pass
+
+    def read_csv(self, directory, min_year=None, min_credits=None, progress=None):
+        """
+        Build the graph from `people.csv`, `movies.csv` and `stars.csv`.
+
+        Stars are streamed `STAR_CHUNK` rows at a time straight into index
+        arrays, and `progress` (if given) is called with the running counts
+        after every chunk. Only movies from `min_year` on, and people with at
+        least `min_credits` of those movies, are kept.
+
+        Returns (and keeps in `load_stats`) the number of star rows read,
+        loaded, skipped as malformed, orphaned (naming an unknown person or
+        movie) and filtered out.
+        """
+        with open(f"{directory}/people.csv", encoding="utf-8") as f:
+            people = sorted(
+                (row["id"], row["name"], row["birth"])
+                for row in csv.DictReader(f)
+            )
+
+        with open(f"{directory}/movies.csv", encoding="utf-8") as f:
+            movies = sorted(
+                (row["id"], row["title"], row["year"])
+                for row in csv.DictReader(f)
+            )
+
+        # Temporary id -> index maps, only needed while reading stars;
+        # people and movies that are filtered out map to -1
+        movie_index = {}
+        kept = []
+        for movie_id, title, year in movies:
+            if min_year is not None and not (year.isdigit() and int(year) >= min_year):
+                movie_index[movie_id] = -1
+                continue
+            movie_index[movie_id] = len(kept)
+            kept.append((movie_id, title, year))
+        movies = kept
+        person_index = {person_id: i for i, (person_id, _, _) in enumerate(people)}
+
+        # Count credits in a first pass, then drop people with too few
+        if min_credits is not None:
+            credits = array(OFFSET, bytes(len(people) * array(OFFSET).itemsize))
+            for chunk in star_chunks(directory):
+                for row in chunk:
+                    if row is None:
+                        continue
+                    person = person_index.get(row[0])
+                    movie = movie_index.get(row[1], -1)
+                    if person is not None and movie >= 0:
+                        credits[person] += 1
+            kept = []
+            for i, row in enumerate(people):
+                if credits[i] >= min_credits:
+                    person_index[row[0]] = len(kept)
+                    kept.append(row)
+                else:
+                    person_index[row[0]] = -1
+            people = kept
+            del credits
+
+        self.person_ids = StringTable.from_strings(row[0] for row in people)
+        self.person_names = StringTable.from_strings(row[1] for row in people)
+        self.person_births = StringTable.from_strings(row[2] for row in people)
+        self.movie_ids = StringTable.from_strings(row[0] for row in movies)
+        self.movie_titles = StringTable.from_strings(row[1] for row in movies)
+        self.movie_years = StringTable.from_strings(row[2] for row in movies)
+        del people, movies
+
+        stats = {"rows": 0, "loaded": 0, "skipped": 0, "orphaned": 0, "filtered": 0}
+        star_people = array(INDEX)
+        star_movies = array(INDEX)
+        for chunk in star_chunks(directory):
+            chunk_people = array(INDEX)
+            chunk_movies = array(INDEX)
+            skipped = orphaned = filtered = 0
+            for row in chunk:
+                if row is None:
+                    skipped += 1
+                    continue
+                person = person_index.get(row[0])
+                movie = movie_index.get(row[1])
+                if person is None or movie is None:
+                    orphaned += 1
+                elif person < 0 or movie < 0:
+                    filtered += 1
+                else:
+                    chunk_people.append(person)
+                    chunk_movies.append(movie)
+            star_people.extend(chunk_people)
+            star_movies.extend(chunk_movies)
+
+            stats["rows"] += len(chunk)
+            stats["loaded"] += len(chunk_people)
+            stats["skipped"] += skipped
+            stats["orphaned"] += orphaned
+            stats["filtered"] += filtered
+            if progress is not None:
+                progress(dict(stats))
+        del person_index, movie_index
+
+        self.build(star_people, star_movies)
+        self.costar_offsets = self.costar_movies = self.costar_people = None
+        self.snapshot = None
+        self.filters = {
+            name: value
+            for name, value in (("min_year", min_year), ("min_credits", min_credits))
+            if value is not None
+        }
+        self.load_stats = stats
+        return stats
+
+    def build(self, star_people, star_movies):
+        """
+        Fill both CSR adjacencies from parallel arrays of (person, movie)
+        index pairs, emptying those arrays as they are consumed.
+        Duplicate pairs are dropped.
+        """
+        self.name_order = array(INDEX, sorted(
+            range(len(self.person_ids)),
+            key=lambda i: self.person_names[i].lower()
+        ))
+
+        # Group movies by person, then sort and deduplicate each group
+        offsets, movies = group(star_people, star_movies, len(self.person_ids))
+        del star_people[:], star_movies[:]
+        self.person_offsets = array(OFFSET, [0])
+        self.person_movies = array(INDEX)
+        for person in range(len(self.person_ids)):
+            previous = -1
+            for movie in sorted(movies[offsets[person]:offsets[person + 1]]):
+                if movie != previous:
+                    self.person_movies.append(movie)
+                    previous = movie
+            self.person_offsets.append(len(self.person_movies))
+        del offsets, movies
+
+        # Invert into people by movie; people come out already sorted
+        people = array(INDEX, bytes(len(self.person_movies) * self.person_movies.itemsize))
+        for person in range(len(self.person_ids)):
+            start, end = self.person_offsets[person], self.person_offsets[person + 1]
+            people[start:end] = array(INDEX, [person]) * (end - start)
+        self.movie_offsets, self.movie_stars = group(
+            self.person_movies, people, len(self.movie_ids)
+        )
+
+    def build_costars(self):
+        """
+        Precompute the deduplicated co-star adjacency for every person.
+        """
+        self.costar_offsets = array(OFFSET, [0])
+        self.costar_movies = array(INDEX)
+        self.costar_people = array(INDEX)
+        for person in range(len(self.person_ids)):
+            movies, people = self.collect_costars(person)
+            self.costar_movies.extend(movies)
+            self.costar_people.extend(people)
+            self.costar_offsets.append(len(self.costar_people))
+
+    def write_snapshot(self, path, sources):
+        """
+        Write the graph to `path`, tagged with the `sources` it was built from.
+        """
+        sections = {}
+        for name in ARRAYS:
+            sections[name] = getattr(self, name)
+        if self.costar_offsets is not None:
+            for name in COSTARS:
+                sections[name] = getattr(self, name)
+        for name in STRINGS:
+            table = getattr(self, name)
+            sections[f"{name}.offsets"] = table.offsets
+            sections[f"{name}.data"] = array("B", bytes(table.data))
+        header = {
+            "version": SNAPSHOT_VERSION,
+            "sources": sources,
+            "filters": self.filters,
+            "stats": self.load_stats
+        }
+        write_sections(path, SNAPSHOT_MAGIC, header, sections)
+
+    def read_snapshot(self, path, sources, filters):
+        """
+        Memory-map the snapshot at `path` if it exists and was built from
+        `sources` with `filters`. Returns whether the graph was loaded.
+        """
+        try:
+            snapshot, header, sections = map_sections(path, SNAPSHOT_MAGIC)
+            if (header["version"] != SNAPSHOT_VERSION or header["sources"] != sources or
+                    header["filters"] != filters):
+                return False
+            for name in ARRAYS:
+                setattr(self, name, sections[name])
+            for name in COSTARS:
+                setattr(self, name, sections.get(name))
+            for name in STRINGS:
+                setattr(self, name, StringTable(sections[f"{name}.offsets"], sections[f"{name}.data"]))
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        self.filters = filters
+        self.load_stats = header["stats"]
+        self.snapshot = snapshot
+        return True
+
+    def person_index(self, person_id):
+        """
+        Return the index of IMDb `person_id`, or None if unknown.
+        """
+        i = bisect_left(self.person_ids, person_id)
+        if i < len(self.person_ids) and self.person_ids[i] == person_id:
+            return i
+        return None
+
+    def movie_index(self, movie_id):
+        """
+        Return the index of IMDb `movie_id`, or None if unknown.
+        """
+        i = bisect_left(self.movie_ids, movie_id)
+        if i < len(self.movie_ids) and self.movie_ids[i] == movie_id:
+            return i
+        return None
+
+    def people_named(self, name):
+        """
+        Return the indices of every person whose name matches `name`,
+        ignoring case.
+        """
+        name = name.lower()
+        key = self.lower_name
+        i = bisect_left(self.name_order, name, key=key)
+        found = []
+        while i < len(self.name_order) and key(self.name_order[i]) == name:
+            found.append(self.name_order[i])
+            i += 1
+        return found
+
+    def lower_name(self, person):
+        return self.person_names[person].lower()
+
+    def credits(self, person):
+        """
+        Return the number of movies `person` starred in.
+        """
+        return self.person_offsets[person + 1] - self.person_offsets[person]
+
+    def movies_of(self, person):
+        return self.person_movies[self.person_offsets[person]:self.person_offsets[person + 1]]
+
+    def stars_of(self, movie):
+        return self.movie_stars[self.movie_offsets[movie]:self.movie_offsets[movie + 1]]
+
+    def neighbors(self, person):
+        """
+        Return (movie, person) index pairs for everyone who starred with
+        `person`: each co-star once, with one movie they share.
+        """
+        self.expanded += 1
+        movies, people = self.costars(person)
+        return zip(movies, people)
+
+    def costars(self, person):
+        """
+        Return parallel arrays of shared movies and co-stars of `person`,
+        from the precomputed adjacency if built, else from the cache.
+        """
+        if self.costar_offsets is not None:
+            start, end = self.costar_offsets[person], self.costar_offsets[person + 1]
+            return self.costar_movies[start:end], self.costar_people[start:end]
+        entry = self.neighbor_cache.get(person)
+        if entry is None:
+            entry = self.collect_costars(person)
+            self.neighbor_cache.put(person, entry)
+        return entry
+
+    def collect_costars(self, person):
+        """
+        Walk every movie of `person` and keep the first movie seen for each
+        distinct co-star (excluding `person` themself).
+        """
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+        shared = {}
+        for i in range(self.person_offsets[person], self.person_offsets[person + 1]):
+            movie = person_movies[i]
+            for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                star = movie_stars[j]
+                if star != person and star not in shared:
+                    shared[star] = movie
+        return array(INDEX, shared.values()), array(INDEX, shared.keys())
+
+
+class NeighborCache():
+    """
+    Least-recently-used cache of per-person co-star arrays, bounded by the
+    approximate number of bytes those arrays take up.
+    """
+
+    # Rough per-entry cost of the dict slot, tuple and two array headers
+    OVERHEAD = 256
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+
+    def get(self, person):
+        entry = self.entries.get(person)
+        if entry is not None:
+            self.entries.move_to_end(person)
+        return entry
+
+    def put(self, person, entry):
+        size = self.entry_size(entry)
+        if size > self.max_bytes:
+            return
+        self.entries[person] = entry
+        self.size += size
+        while self.size > self.max_bytes:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= self.entry_size(evicted)
+
+    def entry_size(self, entry):
+        movies, people = entry
+        return self.OVERHEAD + (len(movies) + len(people)) * movies.itemsize
+
+
+def star_chunks(directory):
+    """
+    Yield the rows of `stars.csv` in lists of at most `STAR_CHUNK`
+    (person_id, movie_id) pairs, with None in place of malformed rows.
+    """
+    with open(f"{directory}/stars.csv", encoding="utf-8", newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        try:
+            person_column = header.index("person_id")
+            movie_column = header.index("movie_id")
+        except ValueError:
+            raise ValueError(f"{directory}/stars.csv needs person_id and movie_id columns")
+        width = max(person_column, movie_column) + 1
+
+        while True:
+            chunk = list(itertools.islice(reader, STAR_CHUNK))
+            if not chunk:
+                return
+            yield [
+                (row[person_column], row[movie_column]) if len(row) >= width else None
+                for row in chunk
+            ]
+
+
+def snapshot_name(filters):
+    """
+    Return the snapshot filename for a graph loaded with `filters`.
+    """
+    if not filters:
+        return SNAPSHOT
+    suffix = "".join(f"-{name}{value}" for name, value in sorted(filters.items()))
+    return SNAPSHOT.replace(".snapshot", f"{suffix}.snapshot")
+
+
+def source_stats(directory):
+    """
+    Return the modification time and size of each CSV file in `directory`,
+    used to tell whether a snapshot is still up to date.
+    """
+    stats = {}
+    for filename in SOURCES:
+        try:
+            stat = os.stat(os.path.join(directory, filename))
+        except OSError:
+            continue
+        stats[filename] = [stat.st_mtime_ns, stat.st_size]
+    return stats
+
+
+def write_sections(path, magic, header, sections):
+    """
+    Write `magic`, the JSON `header` and the named `sections` (arrays) to
+    `path`, each section aligned to 8 bytes so `map_sections` can cast it
+    straight out of a memory map. The file is replaced atomically.
+    """
+    header = dict(header, byteorder=sys.byteorder, sections={})
+
+    # Section offsets are relative to the first 8-byte boundary after the header
+    position = 0
+    for name, values in sections.items():
+        typecode = values.typecode if isinstance(values, array) else values.format
+        header["sections"][name] = [typecode, position, len(values)]
+        position += align(len(values) * values.itemsize)
+    encoded = json.dumps(header).encode("utf-8")
+    prefix = len(magic) + 8 + len(encoded)
+
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        f.write(magic)
+        f.write(len(encoded).to_bytes(8, "little"))
+        f.write(encoded)
+        f.write(bytes(align(prefix) - prefix))
+        for values in sections.values():
+            size = len(values) * values.itemsize
+            f.write(values.tobytes())
+            f.write(bytes(align(size) - size))
+    os.replace(temporary, path)
+
+
+def map_sections(path, magic):
+    """
+    Memory-map a file written by `write_sections`. Returns the map, the
+    header and a dict of typed memoryviews over each section.
+    Raises ValueError if the file is not a valid `magic` file.
+    """
+    with open(path, "rb") as f:
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    if mapped[:len(magic)] != magic:
+        raise ValueError(f"{path} is not a {magic!r} file")
+    start = len(magic) + 8
+    length = int.from_bytes(mapped[len(magic):start], "little")
+    header = json.loads(mapped[start:start + length])
+    start = align(start + length)
+    if header["byteorder"] != sys.byteorder:
+        raise ValueError(f"{path} was written on a {header['byteorder']}-endian machine")
+
+    view = memoryview(mapped)
+    sections = {}
+    for name, (typecode, offset, count) in header["sections"].items():
+        size = count * array(typecode).itemsize
+        if start + offset + size > len(mapped):
+            raise ValueError(f"{path} is truncated")
+        sections[name] = view[start + offset:start + offset + size].cast(typecode)
+    return mapped, header, sections
+
+
+def align(size):
+    return (size + 7) // 8 * 8
+
+
+def group(keys, values, size):
+    """
+    Counting sort of parallel `keys`/`values` arrays by key, returning CSR
+    `offsets` (of length `size + 1`) and the grouped `values`.
+    Values keep their relative order within a key.
+    """
+    offsets = array(OFFSET, bytes((size + 1) * array(OFFSET).itemsize))
+    for key in keys:
+        offsets[key + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    position = offsets[:-1]
+    grouped = array(INDEX, bytes(len(values) * array(INDEX).itemsize))
+    for key, value in zip(keys, values):
+        grouped[position[key]] = value
+        position[key] += 1
+    return offsets, grouped
+
+
+class StringTable(Sequence):
+    """
+    Immutable sequence of strings stored as one UTF-8 buffer plus an array
+    of byte offsets, so it can live in an array or a memory map.
+    """
+
+    def __init__(self, offsets=None, data=b""):
+        self.offsets = array(OFFSET, [0]) if offsets is None else offsets
+        self.data = data
+
+    @classmethod
+    def from_strings(cls, strings):
+        offsets = array(OFFSET, [0])
+        data = bytearray()
+        for string in strings:
+            data += string.encode("utf-8")
+            offsets.append(len(data))
+        return cls(offsets, bytes(data))
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self.offsets) - 1:
+            raise IndexError("string table index out of range")
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+
+class PeopleView(Mapping):
+    """
+    Read-only view mapping person_ids to a dictionary of:
+    name, birth, movies (a set of movie_ids).
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, person_id):
+        person = self.graph.person_index(person_id)
+        if person is None:
+            raise KeyError(person_id)
+        return {
+            "name": self.graph.person_names[person],
+            "birth": self.graph.person_births[person],
+            "movies": {self.graph.movie_ids[movie] for movie in self.graph.movies_of(person)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.person_ids)
+
+    def __len__(self):
+        return len(self.graph.person_ids)
+
+
+class MoviesView(Mapping):
+    """
+    Read-only view mapping movie_ids to a dictionary of:
+    title, year, stars (a set of person_ids).
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, movie_id):
+        movie = self.graph.movie_index(movie_id)
+        if movie is None:
+            raise KeyError(movie_id)
+        return {
+            "title": self.graph.movie_titles[movie],
+            "year": self.graph.movie_years[movie],
+            "stars": {self.graph.person_ids[person] for person in self.graph.stars_of(movie)}
+        }
+
+    def __iter__(self):
+        return iter(self.graph.movie_ids)
+
+    def __len__(self):
+        return len(self.graph.movie_ids)
+
+
+class NamesView(Mapping):
+    """
+    Read-only view mapping lowercase names to a set of corresponding person_ids.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+
+    def __getitem__(self, name):
+        found = self.graph.people_named(name)
+        if not found or name != name.lower():
+            raise KeyError(name)
+        return {self.graph.person_ids[person] for person in found}
+
+    def __iter__(self):
+        previous = None
+        for person in self.graph.name_order:
+            name = self.graph.lower_name(person)
+            if name != previous:
+                yield name
+                previous = name
+
+    def __len__(self):
+        return sum(1 for _ in self)
@@ -0,0 +1,217 @@
+import argparse
+import heapq
+import os
+import sys
+from array import array
+
+from graph import INDEX, Graph, map_sections, source_stats, write_sections
+
+# Subdirectory (next to the CSV files) holding one index file per hub
+HUBS = "hubs"
+HUB_MAGIC = b"DEGHUB\x00\x00"
+HUB_VERSION = 2
+
+# Distance recorded for people the hub cannot reach
+UNREACHED = 0xFFFF
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Precompute single-source shortest-path trees from hub people."
+    )
+    parser.add_argument("directory", help="directory with people.csv, movies.csv and stars.csv")
+    parser.add_argument("people", nargs="*", help="names or person ids to index")
+    parser.add_argument("--top", type=int, default=0,
+                        help="also index the N people with the most movies")
+    args = parser.parse_args()
+
+    graph = Graph()
+    graph.load(args.directory)
+
+    hubs = []
+    for value in args.people:
+        person = graph.person_index(value)
+        if person is None:
+            found = graph.people_named(value)
+            if len(found) != 1:
+                sys.exit(f"'{value}' is unknown or ambiguous, use a person id.")
+            person = found[0]
+        hubs.append(person)
+    hubs.extend(heapq.nlargest(args.top, range(len(graph.person_ids)), key=graph.credits))
+
+    os.makedirs(os.path.join(args.directory, HUBS), exist_ok=True)
+    sources = source_stats(args.directory)
+    for hub in dict.fromkeys(hubs):
+        tree = build_tree(graph, hub)
+        write_tree(hub_path(args.directory, graph.person_ids[hub]), tree, sources, graph.filters)
+        reached = sum(1 for distance in tree.distances if distance != UNREACHED)
+        print(f"Indexed {graph.person_names[hub]} ({graph.person_ids[hub]}): "
+              f"{reached} people reachable")
+
+
+class HubTree():
+    """
+    Breadth-first tree from one hub person. For every person it stores the
+    distance from the hub and the (movie, person) step back towards it, so
+    any path to or from the hub is read off in O(path length).
+    """
+
+    def __init__(self, hub, parent_people, parent_movies, distances):
+        self.hub = hub
+        self.parent_people = parent_people
+        self.parent_movies = parent_movies
+        self.distances = distances
+
+    def distance(self, person):
+        distance = self.distances[person]
+        return None if distance == UNREACHED else distance
+
+    def path_to(self, person):
+        """
+        Returns the (movie, person) path from the hub to `person`, or None.
+        """
+        if self.distances[person] == UNREACHED:
+            return None
+        path = []
+        while person != self.hub:
+            path.append((self.parent_movies[person], person))
+            person = self.parent_people[person]
+        path.reverse()
+        return path
+
+    def path_from(self, person):
+        """
+        Returns the (movie, person) path from `person` to the hub, or None.
+        """
+        if self.distances[person] == UNREACHED:
+            return None
+        path = []
+        while person != self.hub:
+            parent = self.parent_people[person]
+            path.append((self.parent_movies[person], parent))
+            person = parent
+        return path
+
+
+class HubIndex():
+    """
+    Collection of hub trees, keyed by the hub's person index.
+    """
+
+    def __init__(self):
+        self.trees = {}
+
+    def __contains__(self, person):
+        return person in self.trees
+
+    def __len__(self):
+        return len(self.trees)
+
+    def load(self, directory, graph):
+        """
+        Memory-map every hub file under `directory` that was built from the
+        current CSV files with the same filters as `graph`; stale or
+        unreadable files are ignored.
+        """
+        self.trees = {}
+        try:
+            filenames = os.listdir(os.path.join(directory, HUBS))
+        except OSError:
+            return
+        sources = source_stats(directory)
+        for filename in filenames:
+            if not filename.endswith(".hub"):
+                continue
+            try:
+                _, header, sections = map_sections(os.path.join(directory, HUBS, filename), HUB_MAGIC)
+                if (header["version"] != HUB_VERSION or header["sources"] != sources or
+                        header["filters"] != graph.filters or
+                        len(sections["distances"]) != len(graph.person_ids)):
+                    continue
+                hub = header["hub"]
+                self.trees[hub] = HubTree(
+                    hub, sections["parent_people"], sections["parent_movies"], sections["distances"]
+                )
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+
+    def path(self, source, target):
+        """
+        Returns the (movie, person) path between `source` and `target` when
+        either of them is a hub, or None if they are not connected.
+        """
+        if source in self.trees:
+            return self.trees[source].path_to(target)
+        return self.trees[target].path_from(source)
+
+    def separates(self, source, target):
+        """
+        Returns whether some hub reaches exactly one of `source` and
+        `target`, which proves the two are not connected.
+        """
+        return any(
+            (tree.distances[source] == UNREACHED) != (tree.distances[target] == UNREACHED)
+            for tree in self.trees.values()
+        )
+
+    def route(self, source, target):
+        """
+        Returns the shortest path from `source` to `target` that passes
+        through a hub, or None if no hub reaches both. Its length is an
+        upper bound on the true distance.
+        """
+        best, best_distance = None, None
+        for tree in self.trees.values():
+            to_source, to_target = tree.distances[source], tree.distances[target]
+            if to_source == UNREACHED or to_target == UNREACHED:
+                continue
+            if best is None or to_source + to_target < best_distance:
+                best, best_distance = tree, to_source + to_target
+        if best is None:
+            return None
+        return best.path_from(source) + best.path_to(target)
+
+
+def build_tree(graph, hub):
+    """
+    Run a full breadth-first search from person index `hub` over `graph`.
+    """
+    size = len(graph.person_ids)
+    parent_people = array(INDEX, [-1]) * size
+    parent_movies = array(INDEX, [-1]) * size
+    distances = array("H", [UNREACHED]) * size
+
+    distances[hub] = 0
+    frontier = [hub]
+    distance = 0
+    while frontier:
+        distance += 1
+        next_frontier = []
+        for person in frontier:
+            for movie, neighbor in graph.neighbors(person):
+                if distances[neighbor] != UNREACHED:
+                    continue
+                distances[neighbor] = distance
+                parent_people[neighbor] = person
+                parent_movies[neighbor] = movie
+                next_frontier.append(neighbor)
+        frontier = next_frontier
+
+    return HubTree(hub, parent_people, parent_movies, distances)
+
+
+def write_tree(path, tree, sources, filters):
+    header = {"version": HUB_VERSION, "sources": sources, "filters": filters, "hub": tree.hub}
+    write_sections(path, HUB_MAGIC, header, {
+        "parent_people": tree.parent_people,
+        "parent_movies": tree.parent_movies,
+        "distances": tree.distances
+    })
+
+
+def hub_path(directory, person_id):
+    return os.path.join(directory, HUBS, f"{person_id}.hub")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+from array import array
+from bisect import bisect_left
+
+from graph import INDEX
+
+# Fuzzy matching only scores people found through the rarest query trigrams
+RARE_TRIGRAMS = 3
+
+
+class NameIndex():
+    """
+    Non-interactive name lookup over a Graph.
+
+    Exact and prefix matches come from a binary search over the graph's
+    name-sorted `name_order`, which acts as a flattened prefix trie; fuzzy
+    matches come from a trigram index built on first use.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        self.clear()
+
+    def clear(self):
+        """
+        Drop the trigram index, e.g. after the graph was reloaded.
+        """
+        # Distinct lowercase names, the name_order position each starts at,
+        # and the ids of the distinct names containing each trigram
+        self.names = None
+        self.starts = None
+        self.trigrams = None
+
+    def candidates(self, query, limit=10):
+        """
+        Return up to `limit` people matching `query`, best first, as dicts
+        of person_id, name, birth, match ("exact", "prefix" or "fuzzy")
+        and score (between 0 and 1).
+        """
+        found = {}
+        for person in self.graph.people_named(query):
+            found[person] = ("exact", 1.0)
+        if len(found) < limit:
+            for person in self.prefix(query, limit):
+                if person not in found:
+                    found[person] = ("prefix", len(query) / len(self.graph.person_names[person]))
+        if len(found) < limit:
+            for score, person in self.fuzzy(query, limit):
+                if person not in found:
+                    found[person] = ("fuzzy", score)
+
+        tiers = {"exact": 0, "prefix": 1, "fuzzy": 2}
+        ranked = sorted(
+            found.items(),
+            key=lambda item: (tiers[item[1][0]], -item[1][1], -self.graph.credits(item[0]))
+        )
+        return [
+            {
+                "person_id": self.graph.person_ids[person],
+                "name": self.graph.person_names[person],
+                "birth": self.graph.person_births[person],
+                "match": match,
+                "score": round(score, 3)
+            }
+            for person, (match, score) in ranked[:limit]
+        ]
+
+    def prefix(self, query, limit=10):
+        """
+        Return up to `limit` person indices whose name starts with `query`,
+        ignoring case, in name order.
+        """
+        query = query.lower()
+        if not query:
+            return []
+        order = self.graph.name_order
+        key = self.graph.lower_name
+        i = bisect_left(order, query, key=key)
+        found = []
+        while i < len(order) and len(found) < limit and key(order[i]).startswith(query):
+            found.append(order[i])
+            i += 1
+        return found
+
+    def fuzzy(self, query, limit=10):
+        """
+        Return up to `limit` (score, person index) pairs for the names most
+        similar to `query`, scored by trigram Dice similarity.
+        """
+        query = query.lower()
+        wanted = set(trigrams(query))
+        if not wanted:
+            return []
+        if self.trigrams is None:
+            self.build()
+
+        # Gather candidate names from the rarest trigrams, then score them
+        postings = sorted(
+            (self.trigrams[gram] for gram in wanted if gram in self.trigrams),
+            key=len
+        )
+        candidates = set()
+        for posting in postings[:RARE_TRIGRAMS]:
+            candidates.update(posting)
+
+        scored = []
+        for name_id in candidates:
+            grams = set(trigrams(self.names[name_id]))
+            scored.append((2 * len(wanted & grams) / (len(wanted) + len(grams)), name_id))
+        scored.sort(key=lambda item: (-item[0], self.names[item[1]]))
+
+        found = []
+        for score, name_id in scored:
+            for i in range(self.starts[name_id], self.starts[name_id + 1]):
+                found.append((score, self.graph.name_order[i]))
+            if len(found) >= limit:
+                break
+        return found[:limit]
+
+    def build(self):
+        """
+        Build the trigram index over every distinct lowercase name.
+        """
+        self.names = []
+        self.starts = array(INDEX)
+        index = {}
+        previous = None
+        for i, person in enumerate(self.graph.name_order):
+            name = self.graph.lower_name(person)
+            if name == previous:
+                continue
+            previous = name
+            name_id = len(self.names)
+            self.names.append(name)
+            self.starts.append(i)
+            for gram in set(trigrams(name)):
+                index.setdefault(gram, array(INDEX)).append(name_id)
+        self.starts.append(len(self.graph.name_order))
+        self.trigrams = index
+
+
+def trigrams(name):
+    """
+    Return the overlapping three-character pieces of `name`, padded so
+    the start and end of the name count too.
+    """
+    padded = f"  {name} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
@@ -0,0 +1,156 @@
+import heapq
+
+from factors import distributions, pedigree_factors
+
+
+def variable_elimination(people):
+    """
+    Return every person's gene and trait distribution given the known
+    traits, in the format of `heredity.main`'s normalized `probabilities`,
+    by exact variable elimination instead of enumeration.
+
+    Every gene variable is summed out once, in one min-fill order (see
+    `eliminate`), and the messages that leaves are passed back down, so
+    each person's marginal reuses the same intermediate factors and the
+    cost grows with the width of the pedigree rather than exponentially
+    with its size.
+    """
+    factors = pedigree_factors(people)
+    order = min_fill_order(factors, list(people))
+    buckets, up, parents = eliminate(factors, order)
+    children = [[] for _ in order]
+    for i, parent in enumerate(parents):
+        if parent is not None:
+            children[parent].append(i)
+
+    # Buckets come before the one their message goes to: pass back down in
+    # reverse order, each bucket sending its children what the rest of the
+    # family says about the variables they share with it
+    down = [None] * len(order)
+    genes = {}
+    for i in reversed(range(len(order))):
+        incoming = buckets[i] + [up[child] for child in children[i]]
+        if down[i] is not None:
+            incoming.append(down[i])
+        genes[order[i]] = marginal(incoming, order[i])
+        for child in children[i]:
+            others = [factor for factor in incoming if factor is not up[child]]
+            if not others:
+                continue
+            message = product(others)
+            for variable in message.variables:
+                if variable not in up[child].variables:
+                    message = message.sum_out(variable)
+            down[child] = message.normalized()
+    return distributions(people, genes)
+
+
+def eliminate(factors, order):
+    """
+    Sum the variables in `order` out of the product of `factors`, one at a
+    time (bucket elimination).
+
+    Each factor starts in the bucket of its first variable in `order`.
+    Eliminating a variable multiplies its bucket, sums the variable out,
+    and puts the resulting message, normalized so that long pedigrees
+    don't underflow, in the bucket of its first remaining variable.
+    Returns every bucket's own factors, every bucket's message and the
+    index of the bucket it went to (None if it has no variables left).
+    """
+    position = {variable: i for i, variable in enumerate(order)}
+    buckets = [[] for _ in order]
+    for factor in factors:
+        buckets[min(position[variable] for variable in factor.variables)].append(factor)
+
+    # Messages each bucket receives, kept apart from its own factors
+    received = [[] for _ in order]
+    up = [None] * len(order)
+    parents = [None] * len(order)
+    for i, variable in enumerate(order):
+        message = product(buckets[i] + received[i]).sum_out(variable).normalized()
+        up[i] = message
+        if message.variables:
+            parents[i] = min(position[other] for other in message.variables)
+            received[parents[i]].append(message)
+    return buckets, up, parents
+
+
+def product(factors):
+    """
+    Return the product of a non-empty list of factors.
+    """
+    result = factors[0]
+    for factor in factors[1:]:
+        result = result.multiply(factor)
+    return result
+
+
+def marginal(factors, variable):
+    """
+    Return the normalized distribution of `variable` in the product of
+    `factors`.
+    """
+    belief = product(factors)
+    for other in belief.variables:
+        if other != variable:
+            belief = belief.sum_out(other)
+    return {values[0]: value for values, value in belief.normalized().table.items()}
+
+
+def interaction_graph(factors):
+    """
+    Return a dict mapping each variable to the set of variables it shares
+    a factor with.
+    """
+    neighbors = {}
+    for factor in factors:
+        for variable in factor.variables:
+            neighbors.setdefault(variable, set()).update(factor.variables)
+            neighbors[variable].discard(variable)
+    return neighbors
+
+
+def min_fill_order(factors, variables):
+    """
+    Return an elimination order for `variables` that greedily picks the
+    variable whose elimination adds the fewest new edges between its
+    neighbours, breaking ties by fewest neighbours and then by name.
+
+    Costs are kept in a heap and only recomputed around each eliminated
+    variable, so sparse pedigrees are ordered in near-linear time.
+    """
+    neighbors = interaction_graph(factors)
+    remaining = set(variables)
+
+    def cost(variable):
+        around = list(neighbors[variable])
+        fill = sum(
+            1 for i, a in enumerate(around) for b in around[i + 1:]
+            if b not in neighbors[a]
+        )
+        return fill, len(around), variable
+
+    costs = {variable: cost(variable) for variable in remaining}
+    heap = list(costs.values())
+    heapq.heapify(heap)
+    order = []
+    while heap:
+        entry = heapq.heappop(heap)
+        variable = entry[2]
+        if variable not in remaining or costs[variable] != entry:
+            continue
+        around = neighbors.pop(variable)
+        for a in around:
+            neighbors[a].discard(variable)
+            neighbors[a].update(around - {a})
+        remaining.discard(variable)
+        order.append(variable)
+
+        # Only the neighbours and their neighbours can have a new cost
+        affected = set(around)
+        for a in around:
+            affected.update(neighbors[a])
+        for a in affected & remaining:
+            costs[a] = cost(a)
+            heapq.heappush(heap, costs[a])
+    return order
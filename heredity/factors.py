@@ -0,0 +1,102 @@
+import itertools
+
+from heredity import PROBS, inheritance_probability
+
+# Values a gene variable can take: the number of copies of the gene
+GENES = (2, 1, 0)
+
+
+class Factor():
+    """
+    Table of non-negative values over the gene counts of some people:
+    `table` maps every tuple of gene counts (one per name in `variables`,
+    in order) to a value.
+    """
+
+    def __init__(self, variables, table):
+        self.variables = tuple(variables)
+        self.table = table
+
+    def value(self, assignment):
+        """
+        Return the value for `assignment`, a dict mapping names to gene counts.
+        """
+        return self.table[tuple(assignment[variable] for variable in self.variables)]
+
+    def multiply(self, other):
+        variables = self.variables + tuple(v for v in other.variables if v not in self.variables)
+        table = {}
+        for values in itertools.product(GENES, repeat=len(variables)):
+            assignment = dict(zip(variables, values))
+            table[values] = self.value(assignment) * other.value(assignment)
+        return Factor(variables, table)
+
+    def sum_out(self, variable):
+        """
+        Return the factor with `variable` summed out.
+        """
+        position = self.variables.index(variable)
+        table = {}
+        for values, value in self.table.items():
+            key = values[:position] + values[position + 1:]
+            table[key] = table.get(key, 0) + value
+        return Factor(self.variables[:position] + self.variables[position + 1:], table)
+
+    def normalized(self):
+        total = sum(self.table.values())
+        return Factor(self.variables, {values: value / total for values, value in self.table.items()})
+
+
+def person_factor(people, person):
+    """
+    Return the factor of `person`'s gene count given their parents', times
+    the probability of their known trait (if any), as in `joint_probability`.
+
+    People without parents use the unconditional gene distribution; a
+    missing parent of someone with one known parent counts as having no
+    copies of the gene, like in `joint_probability`.
+    """
+    mother = people[person]["mother"]
+    father = people[person]["father"]
+    trait = people[person]["trait"]
+    parents = tuple(parent for parent in (mother, father) if parent)
+
+    table = {}
+    for values in itertools.product(GENES, repeat=1 + len(parents)):
+        genes = dict(zip((person,) + parents, values))
+        if not parents:
+            value = PROBS["gene"][values[0]]
+        else:
+            value = inheritance_probability(genes.get(mother, 0), genes.get(father, 0), values[0])
+        if trait is not None:
+            value *= PROBS["trait"][values[0]][trait]
+        table[values] = value
+    return Factor((person,) + parents, table)
+
+
+def pedigree_factors(people):
+    """
+    Compile the family in `people` into one factor per person over gene
+    counts, with known traits folded in as evidence.
+    """
+    return [person_factor(people, person) for person in people]
+
+
+def distributions(people, genes):
+    """
+    Return the gene and trait distributions of every person, in the same
+    format as the `probabilities` of `heredity.main`, given `genes`, a dict
+    mapping each person to their normalized gene count distribution given
+    the evidence.
+    """
+    probabilities = {}
+    for person in people:
+        gene = {count: genes[person][count] for count in GENES}
+        trait = people[person]["trait"]
+        if trait is None:
+            has_trait = sum(gene[count] * PROBS["trait"][count][True] for count in GENES)
+            distribution = {True: has_trait, False: 1 - has_trait}
+        else:
+            distribution = {True: 1.0 if trait else 0.0, False: 0.0 if trait else 1.0}
+        probabilities[person] = {"gene": gene, "trait": distribution}
+    return probabilities
@@ -1,7 +1,7 @@
+import argparse
 import csv
 import itertools
 from operator import ge
-import sys
 
 PROBS = {
 
@@ -39,11 +39,65 @@ PROBS = {
 
 
 def main():
+    parser = argparse.ArgumentParser(
+        description="Compute gene and trait probabilities for every person in a family."
+    )
+    parser.add_argument("data", help="CSV file with name, mother, father and trait columns")
+    parser.add_argument("--method",
+                        choices=["enumerate", "elimination", "junction", "likelihood", "gibbs"],
+                        default="enumerate",
+                        help="enumerate every assignment, use exact variable elimination or a "
+                             "junction tree, or sample by likelihood weighting or Gibbs sampling")
+    parser.add_argument("--samples", type=int,
+                        help="samples drawn by the sampling methods (Gibbs rounds them down "
+                             "to a multiple of its chains)")
+    parser.add_argument("--seed", type=int, help="seed for the sampling methods")
+    args = parser.parse_args()
+    people = load_data(args.data)
+    intervals = None
+
+    if args.method == "enumerate":
+        probabilities = enumerate_probabilities(people)
+    elif args.method == "elimination":
+        # Imported here because the engines use PROBS from this module
+        from elimination import variable_elimination
+        probabilities = variable_elimination(people)
+    elif args.method == "junction":
+        from junction import junction_tree
+        probabilities = junction_tree(people)
+    else:
+        from sampling import CHAINS, SAMPLES, gibbs_sampling, likelihood_weighting
+        sample = likelihood_weighting if args.method == "likelihood" else gibbs_sampling
+        samples = args.samples or SAMPLES
+        if sample is gibbs_sampling and samples < CHAINS:
+            parser.error(f"--samples must be at least {CHAINS}, one per Gibbs chain")
+        probabilities, intervals = sample(people, samples=samples, seed=args.seed)
 
-    # Check for proper usage
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python heredity.py data.csv")
-    people = load_data(sys.argv[1])
+    # Print results
+    for person in people:
+        print(f"{person}:")
+        for field in probabilities[person]:
+            print(f"  {field.capitalize()}:")
+            for value in probabilities[person][field]:
+                p = probabilities[person][field][value]
+                if intervals is None:
+                    print(f"    {value}: {p:.4f}")
+                else:
+                    low, high = intervals[person][field][value]
+                    print(f"    {value}: {p:.4f} (95% CI {low:.4f}-{high:.4f})")
+
+
+def enumerate_probabilities(people):
+    """
+    Return every person's normalized gene and trait distributions given
+    the known traits, by enumerating every assignment of genes.
+
+    This gives the same distributions as summing `joint_probability` over
+    every assignment of genes and traits that agrees with the known
+    traits, but without enumerating traits at all: each gene assignment's
+    probability is computed once, and split between the values of every
+    unknown trait by `PROBS["trait"]`.
+    """
 
     # Keep track of gene and trait probabilities for each person
     probabilities = {
@@ -61,37 +115,33 @@ def main():
         for person in people
     }
 
-    # Loop over all sets of people who might have the trait
-    names = set(people)
-    for have_trait in powerset(names):
-
-        # Check if current set of people violates known information
-        fails_evidence = any(
-            (people[person]["trait"] is not None and
-             people[person]["trait"] != (person in have_trait))
-            for person in names
-        )
-        if fails_evidence:
-            continue
-        # Loop over all sets of people who might have the gene
-        for one_gene in powerset(names):
-            for two_genes in powerset(names - one_gene):
+    # Traits are left out of the enumeration: known traits are evidence
+    # shared by every assignment, and unknown ones are summed out
+    family = Family(people)
+    n = len(family.names)
+    known = [people[person]["trait"] for person in family.names]
+    gene_sums = [[0, 0, 0] for _ in range(n)]
+    trait_sums = [[0, 0] for _ in range(n)]
+    for one_mask, two_mask in gene_assignments(n):
+        genes = family.unpack(one_mask, two_mask)
+        p = family.evidence_probability(genes)
+        for i in range(n):
+            gene_sums[i][genes[i]] += p
+            if known[i] is None:
+                for value in (True, False):
+                    trait_sums[i][value] += p * PROBS["trait"][genes[i]][value]
+            else:
+                trait_sums[i][known[i]] += p
 
-                # Update probabilities with new joint probability
-                p = joint_probability(people, one_gene, two_genes, have_trait)
-                update(probabilities, one_gene, two_genes, have_trait, p)
+    for i, person in enumerate(family.names):
+        for count in (2, 1, 0):
+            probabilities[person]["gene"][count] = gene_sums[i][count]
+        for value in (True, False):
+            probabilities[person]["trait"][value] = trait_sums[i][value]
 
     # Ensure probabilities sum to 1
     normalize(probabilities)
-
-    # Print results
-    for person in people:
-        print(f"{person}:")
-        for field in probabilities[person]:
-            print(f"  {field.capitalize()}:")
-            for value in probabilities[person][field]:
-                p = probabilities[person][field][value]
-                print(f"    {value}: {p:.4f}")
+    return probabilities
 
 
 def load_data(filename):
@@ -128,6 +178,105 @@ def powerset(s):
     ]
 
 
+class Family():
+    """
+    Family compiled for `enumerate_probabilities`: people numbered in the
+    order of `people`, parents as indices, gene assignments as bitmasks,
+    and each person's factor as a table indexed by gene counts, with a
+    known trait folded in and an unknown one summed out, so it is one
+    lookup.
+
+    Index `n` (one past the last person) stands for a missing parent and
+    always has no copies of the gene, as in `joint_probability`.
+    """
+
+    # PROBS values the cached tables were built from, and the tables
+    probs = None
+    cached = None
+
+    def __init__(self, people):
+        self.size = len(people)
+        self.names = list(people)
+        n = len(self.names)
+        index = {person: i for i, person in enumerate(self.names)}
+        inherit, prior, tables = Family.tables()
+
+        self.mothers = []
+        self.fathers = []
+        self.evidence = []
+        for i, person in enumerate(self.names):
+            mother = people[person]["mother"]
+            father = people[person]["father"]
+            has_parents = bool(mother or father)
+            self.mothers.append(index[mother] if mother else n)
+            self.fathers.append(index[father] if father else n)
+
+            # Known traits are evidence; unknown ones are summed out
+            trait = people[person]["trait"]
+            if trait is None:
+                self.evidence.append(inherit if has_parents else prior)
+            else:
+                self.evidence.append(tables[has_parents][trait])
+
+    @classmethod
+    def tables(cls):
+        """
+        Return the PROBS tables `(inherit, prior, tables)`, rebuilt only when
+        a value in PROBS has changed since they were last built.
+
+        `inherit` and `prior` are the child's gene probability indexed
+        [mother_genes][father_genes][child_genes], with and without parents;
+        `tables[has_parents]` is that times the probability of having the
+        trait or not, indexed [has_trait][mother_genes][father_genes][child_genes].
+        """
+        gene = PROBS["gene"]
+        trait = PROBS["trait"]
+        probs = (
+            gene[2], gene[1], gene[0],
+            trait[2][True], trait[2][False], trait[1][True], trait[1][False],
+            trait[0][True], trait[0][False],
+            PROBS["mutation"]
+        )
+        if probs == cls.probs:
+            return cls.cached
+
+        inherit = [[[inheritance_probability(mother, father, child) for child in range(3)]
+                    for father in range(3)]
+                   for mother in range(3)]
+        prior = [[[gene[child] for child in range(3)] for father in range(3)]
+                 for mother in range(3)]
+
+        def with_trait(table):
+            return [[[[trait[child][has_trait] * table[mother][father][child]
+                       for child in range(3)]
+                      for father in range(3)]
+                     for mother in range(3)]
+                    for has_trait in (False, True)]
+
+        cls.probs = probs
+        cls.cached = inherit, prior, {False: with_trait(prior), True: with_trait(inherit)}
+        return cls.cached
+
+    def unpack(self, one_mask, two_mask):
+        """
+        Return everyone's gene count as a list by index, given bitmasks of
+        who has one copy and who has two.
+        """
+        genes = [(one_mask >> i & 1) | (two_mask >> i & 1) << 1 for i in range(self.size)]
+        genes.append(0)
+        return genes
+
+    def evidence_probability(self, genes):
+        """
+        Return the probability of the gene counts `genes` and everyone with
+        a known trait having it, with unknown traits summed out.
+        """
+        probability = 1
+        for i, table in enumerate(self.evidence):
+            probability *= table[genes[self.mothers[i]]][genes[self.fathers[i]]][genes[i]]
+        return probability
+
+
 def joint_probability(people, one_gene, two_genes, have_trait):
     """
     Compute and return a joint probability.
@@ -138,61 +287,75 @@ def joint_probability(people, one_gene, two_genes, have_trait):
         * everyone not in `one_gene` or `two_gene` does not have the gene, and
         * everyone in set `have_trait` has the trait, and
         * everyone not in set` have_trait` does not have the trait.
+
+    Only PROBS is compiled, into tables (see `Family.tables`) that make
+    each person's factor one lookup; `people` is read afresh on every
+    call, so edits to it are always picked up.
     """
+    tables = Family.tables()[2]
     probability = 1
-    for person in people:
-        sum = 1
-        # Find out what group the person is in [one_gene or two_gene or None], [have_trait or None]
-        person_trait = True if person in have_trait else False
-        person_mutated_gene = 2 if person in two_genes else 1 if person in one_gene else 0
+    for person, row in people.items():
+        mother = row["mother"]
+        father = row["father"]
+        genes = 2 if person in two_genes else 1 if person in one_gene else 0
+        mother_genes = 2 if mother in two_genes else 1 if mother in one_gene else 0
+        father_genes = 2 if father in two_genes else 1 if father in one_gene else 0
+        table = tables[bool(mother or father)][person in have_trait]
+        probability *= table[mother_genes][father_genes][genes]
+    return probability
 
-        # Prob of the trait being True or False based on number of mutated genes
-        sum *= PROBS["trait"][person_mutated_gene][person_trait]
-
-        # If person doesn't have parents in the dataset
-        mother = people[person]["mother"]
-        father = people[person]["father"]
-
-        if not mother and not father:
-            sum *= PROBS["gene"][person_mutated_gene]
-        # If person has parents find out the probability of getting mutated genes
-        else:
-            mother_mutated_gene = 2 if mother in two_genes else 1 if mother in one_gene else 0
-            father_mutated_gene = 2 if father in two_genes else 1 if father in one_gene else 0
-            mother_prob = 0
-            father_prob = 0
-
-            # Mutated gene will transfer with a prob of 1.0, but it can mutate with a prob of PROBS["mutation"]
-            if mother_mutated_gene == 2:
-                mother_prob = 1 - PROBS["mutation"]
-            # Either a mutated gene is transfered or a healthy one
-            elif mother_mutated_gene == 1:
-                mother_prob = 0.5
-            else:
-            # All genes are healthy so the only way to get a mutated one is for it to mutate (PROBS["mutation"])
-                mother_prob = PROBS["mutation"]
-            
-            # Same for the father gene
-            if father_mutated_gene == 2:
-                father_prob = 1 - PROBS["mutation"]
-            elif father_mutated_gene == 1:
-                father_prob = 0.5
-            else:
-                father_prob = PROBS["mutation"]
-            
-            # Person inheriting two mutated genes
-            if person_mutated_gene == 2:
-                sum *= mother_prob * father_prob
-            # Person inheriting one mutated gene
-            elif person_mutated_gene == 1:
-                sum *= (1 - father_prob) * (mother_prob) + (1 - mother_prob) * (father_prob)
-            # Person inheriting no mutated gene
-            else:
-                sum *= (1 - mother_prob) * (1 - father_prob)
-        
-        probability *= sum
 
-    return probability
+def inheritance_probability(mother_mutated_gene, father_mutated_gene, person_mutated_gene):
+    """
+    Return the probability that a child of parents with `mother_mutated_gene`
+    and `father_mutated_gene` copies of the gene has `person_mutated_gene`.
+    """
+    # Mutated gene will transfer with a prob of 1.0, but it can mutate with a prob of PROBS["mutation"]
+    if mother_mutated_gene == 2:
+        mother_prob = 1 - PROBS["mutation"]
+    # Either a mutated gene is transfered or a healthy one
+    elif mother_mutated_gene == 1:
+        mother_prob = 0.5
+    else:
+    # All genes are healthy so the only way to get a mutated one is for it to mutate (PROBS["mutation"])
+        mother_prob = PROBS["mutation"]
+
+    # Same for the father gene
+    if father_mutated_gene == 2:
+        father_prob = 1 - PROBS["mutation"]
+    elif father_mutated_gene == 1:
+        father_prob = 0.5
+    else:
+        father_prob = PROBS["mutation"]
+
+    # Person inheriting two mutated genes
+    if person_mutated_gene == 2:
+        return mother_prob * father_prob
+    # Person inheriting one mutated gene
+    elif person_mutated_gene == 1:
+        return (1 - father_prob) * (mother_prob) + (1 - mother_prob) * (father_prob)
+    # Person inheriting no mutated gene
+    else:
+        return (1 - mother_prob) * (1 - father_prob)
+
+
+def gene_assignments(n):
+    """
+    Lazily yield every way of giving `n` people zero, one or two copies of
+    the gene, as bitmasks (bit i for person i) of who has one copy and who
+    has two.
+    """
+    everyone = (1 << n) - 1
+    for one_mask in range(1 << n):
+        rest = everyone & ~one_mask
+
+        # Every subset of the rest, from all of it down to none
+        two_mask = rest
+        while True:
+            yield one_mask, two_mask
+            if two_mask == 0:
+                break
+            two_mask = (two_mask - 1) & rest
 
 
 def update(probabilities, one_gene, two_genes, have_trait, p):
@@ -0,0 +1,119 @@
+import itertools
+
+from elimination import min_fill_order
+from factors import GENES, Factor, distributions, pedigree_factors
+
+
+class JunctionTree():
+    """
+    Clique tree compiled from a family's gene factors.
+
+    Eliminating the gene variables in min-fill order gives one clique per
+    variable: the variable and its neighbours when it is eliminated. Each
+    clique's parent is the clique of the next variable eliminated among
+    those neighbours, which makes the cliques a tree where every variable's
+    cliques are connected. Each factor lives in the first clique holding
+    all its variables.
+    """
+
+    def __init__(self, factors):
+        variables = list(dict.fromkeys(v for factor in factors for v in factor.variables))
+        order = min_fill_order(factors, variables)
+        position = {variable: i for i, variable in enumerate(order)}
+
+        # Replay the elimination to read off the cliques
+        neighbors = {variable: set() for variable in variables}
+        for factor in factors:
+            for variable in factor.variables:
+                neighbors[variable].update(v for v in factor.variables if v != variable)
+        self.variables = order
+        self.position = position
+        self.cliques = []
+        self.parents = []
+        for variable in order:
+            around = neighbors.pop(variable)
+            for a in around:
+                neighbors[a].discard(variable)
+                neighbors[a].update(around - {a})
+            self.cliques.append((variable,) + tuple(sorted(around, key=position.get)))
+            self.parents.append(min((position[a] for a in around), default=None))
+
+        self.children = [[] for _ in order]
+        for i, parent in enumerate(self.parents):
+            if parent is not None:
+                self.children[parent].append(i)
+
+        # Start every clique at all ones and multiply in its factors
+        self.potentials = [
+            Factor(clique, dict.fromkeys(itertools.product(GENES, repeat=len(clique)), 1.0))
+            for clique in self.cliques
+        ]
+        for factor in factors:
+            home = min(position[variable] for variable in factor.variables)
+            self.potentials[home] = self.potentials[home].multiply(factor)
+        self.beliefs = None
+
+    def calibrate(self):
+        """
+        Pass messages up from the leaves to the roots, then back down, so
+        every clique's belief is proportional to the joint distribution of
+        its variables given the evidence. Messages are normalized as they
+        go, so long pedigrees don't underflow.
+        """
+        # Cliques are created in elimination order, so every clique comes
+        # before its parent: collect in that order, distribute in reverse
+        up = [None] * len(self.cliques)
+        for i, clique in enumerate(self.cliques):
+            if self.parents[i] is None:
+                continue
+            message = self.potentials[i]
+            for child in self.children[i]:
+                message = message.multiply(up[child])
+            up[i] = message.sum_out(clique[0]).normalized()
+
+        down = [None] * len(self.cliques)
+        self.beliefs = [None] * len(self.cliques)
+        for i in reversed(range(len(self.cliques))):
+            base = self.potentials[i]
+            if down[i] is not None:
+                base = base.multiply(down[i])
+            children = self.children[i]
+
+            # Products of the children's messages before and after each
+            # child, so every child gets the others' without a division
+            before = [base]
+            for child in children:
+                before.append(before[-1].multiply(up[child]))
+            self.beliefs[i] = before[-1]
+            after = None
+            for k in reversed(range(len(children))):
+                child = children[k]
+                message = before[k] if after is None else before[k].multiply(after)
+                for variable in message.variables:
+                    if variable not in self.cliques[child]:
+                        message = message.sum_out(variable)
+                down[child] = message.normalized()
+                after = up[child] if after is None else after.multiply(up[child])
+
+    def marginal(self, variable):
+        """
+        Return the normalized distribution of `variable` given the evidence.
+        """
+        if self.beliefs is None:
+            self.calibrate()
+        belief = self.beliefs[self.position[variable]]
+        for other in belief.variables:
+            if other != variable:
+                belief = belief.sum_out(other)
+        return {values[0]: value for values, value in belief.normalized().table.items()}
+
+
+def junction_tree(people):
+    """
+    Return every person's gene and trait distribution given the known
+    traits, in the format of `heredity.main`'s normalized `probabilities`,
+    from a single calibration of the family's junction tree.
+    """
+    tree = JunctionTree(pedigree_factors(people))
+    tree.calibrate()
+    return distributions(people, {person: tree.marginal(person) for person in people})
@@ -0,0 +1,232 @@
+from statistics import NormalDist
+
+import numpy as np
+
+from factors import GENES, distributions
+from heredity import PROBS, inheritance_probability
+
+# Default number of samples, and of Gibbs chains run side by side
+SAMPLES = 10000
+CHAINS = 100
+
+# Gibbs sweeps each chain makes before its samples are counted
+BURN_IN = 100
+
+
+class Pedigree():
+    """
+    Family compiled for vectorized sampling: people numbered in an order
+    where parents come before their children, parent indices as arrays,
+    and PROBS as NumPy tables indexed by gene count.
+
+    Index `n` (one past the last person) stands for the missing parent of
+    someone with only one known parent, and always has no copies of the
+    gene, as in `joint_probability`.
+    """
+
+    def __init__(self, people):
+        # Depth-first order, with a stack so deep pedigrees can't overflow it
+        self.names = []
+        seen = set()
+        for person in people:
+            stack = [(person, False)]
+            while stack:
+                current, expanded = stack.pop()
+                if expanded:
+                    self.names.append(current)
+                    continue
+                if current in seen:
+                    continue
+                seen.add(current)
+                stack.append((current, True))
+                for parent in (people[current]["father"], people[current]["mother"]):
+                    if parent and parent not in seen:
+                        stack.append((parent, False))
+        index = {person: i for i, person in enumerate(self.names)}
+        n = len(self.names)
+
+        self.mothers = np.full(n, -1)
+        self.fathers = np.full(n, -1)
+        self.traits = np.full(n, -1)
+        for i, person in enumerate(self.names):
+            mother = people[person]["mother"]
+            father = people[person]["father"]
+            if mother or father:
+                self.mothers[i] = index[mother] if mother else n
+                self.fathers[i] = index[father] if father else n
+            if people[person]["trait"] is not None:
+                self.traits[i] = int(people[person]["trait"])
+        self.children = [
+            np.flatnonzero((self.mothers == i) | (self.fathers == i)) for i in range(n)
+        ]
+
+        self.prior = np.array([PROBS["gene"][genes] for genes in range(3)])
+        self.inherit = np.array([
+            [[inheritance_probability(mother, father, child) for child in range(3)]
+             for father in range(3)]
+            for mother in range(3)
+        ])
+        self.trait = np.array([
+            [PROBS["trait"][genes][False], PROBS["trait"][genes][True]] for genes in range(3)
+        ])
+
+    def __len__(self):
+        return len(self.names)
+
+    def local(self, i, genes, evidence=True):
+        """
+        Return, for every sample, the probabilities of person `i` having 0,
+        1 or 2 copies given their parents' genes (columns of `genes`) and,
+        with `evidence`, their known trait, unnormalized.
+        """
+        if self.mothers[i] < 0:
+            probabilities = np.broadcast_to(self.prior, (len(genes), 3))
+        else:
+            probabilities = self.inherit[genes[:, self.mothers[i]], genes[:, self.fathers[i]]]
+        if evidence and self.traits[i] >= 0:
+            probabilities = probabilities * self.trait[:, self.traits[i]]
+        return probabilities
+
+
+def likelihood_weighting(people, samples=SAMPLES, seed=None, confidence=0.95):
+    """
+    Estimate every person's gene and trait distribution given the known
+    traits by likelihood weighting.
+
+    All `samples` families are drawn at once: genes are sampled parents
+    first, and each known trait multiplies the sample's weight by its
+    probability instead of being sampled. Unknown traits are not sampled
+    either; their probability given the sampled genes is averaged.
+
+    Returns the distributions, in the format of `heredity.main`'s
+    normalized `probabilities`, and the matching `confidence` intervals.
+    """
+    pedigree = Pedigree(people)
+    rng = np.random.default_rng(seed)
+    n = len(pedigree)
+    genes = np.zeros((samples, n + 1), dtype=np.int64)
+
+    # Weights are kept as logs, since their product over a large pedigree
+    # underflows, and scaled so the largest is 1 before use
+    log_weights = np.zeros(samples)
+    for i in range(n):
+        genes[:, i] = draw(rng, pedigree.local(i, genes, evidence=False))
+        if pedigree.traits[i] >= 0:
+            log_weights += np.log(pedigree.trait[genes[:, i], pedigree.traits[i]])
+    weights = np.exp(log_weights - log_weights.max())
+
+    # Self-normalized estimates, with Wilson intervals over the effective
+    # sample size so that collapsed weights give wide intervals
+    total = weights.sum()
+    effective = total ** 2 / (weights ** 2).sum()
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    def estimate(values):
+        mean = float((weights * values).sum() / total)
+        return (mean,) + wilson(mean, effective, z)
+
+    return summarize(people, pedigree, genes[:, :n], estimate)
+
+
+def gibbs_sampling(people, samples=SAMPLES, chains=CHAINS, burn_in=BURN_IN, seed=None,
+                   confidence=0.95):
+    """
+    Estimate every person's gene and trait distribution given the known
+    traits by Gibbs sampling over gene counts.
+
+    `chains` independent chains are updated side by side as NumPy arrays:
+    each sweep redraws every person's genes from their distribution given
+    their parents', their children's and their own known trait. After
+    `burn_in` sweeps, each chain makes `samples // chains` more sweeps that
+    are counted, so `samples` is rounded down to a multiple of `chains`.
+    Confidence intervals come from the spread between the chains' own
+    estimates, so they account for correlated samples; there must be at
+    least 2 chains, and at least as many samples as chains.
+
+    Returns the distributions, in the format of `heredity.main`'s
+    normalized `probabilities`, and the matching `confidence` intervals.
+    """
+    if chains < 2:
+        raise ValueError(f"Gibbs sampling needs at least 2 chains, got {chains}")
+    if samples < chains:
+        raise ValueError(f"Gibbs sampling needs at least {chains} samples, one per chain")
+    pedigree = Pedigree(people)
+    rng = np.random.default_rng(seed)
+    n = len(pedigree)
+    sweeps = samples // chains
+
+    # Start every chain from a forward sample of the family
+    genes = np.zeros((chains, n + 1), dtype=np.int64)
+    for i in range(n):
+        genes[:, i] = draw(rng, pedigree.local(i, genes))
+
+    # Every possible gene count of the person being redrawn, as a row
+    options = np.arange(3)[None, :]
+    counted = np.zeros((sweeps, chains, n), dtype=np.int64)
+    for sweep in range(burn_in + sweeps):
+        for i in range(n):
+            probabilities = pedigree.local(i, genes)
+            for child in pedigree.children[i]:
+                mother, father = pedigree.mothers[child], pedigree.fathers[child]
+                mothers = options if mother == i else genes[:, mother][:, None]
+                fathers = options if father == i else genes[:, father][:, None]
+                probabilities = probabilities * pedigree.inherit[mothers, fathers,
+                                                                 genes[:, child][:, None]]
+            genes[:, i] = draw(rng, probabilities)
+        if sweep >= burn_in:
+            counted[sweep - burn_in] = genes[:, :n]
+
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+
+    def estimate(values):
+        per_chain = values.reshape(sweeps, chains).mean(axis=0)
+        mean = float(per_chain.mean())
+        error = float(per_chain.std(ddof=1)) / np.sqrt(chains)
+        return mean, max(0.0, mean - z * error), min(1.0, mean + z * error)
+
+    return summarize(people, pedigree, counted.reshape(sweeps * chains, n), estimate)
+
+
+def draw(rng, probabilities):
+    """
+    Draw one gene count per row of the (unnormalized) `probabilities`.
+    """
+    cumulative = np.cumsum(probabilities, axis=1)
+    thresholds = rng.random(len(cumulative)) * cumulative[:, -1]
+    return (thresholds[:, None] >= cumulative[:, :-1]).sum(axis=1)
+
+
+def summarize(people, pedigree, genes, estimate):
+    """
+    Turn sampled gene counts (one column per person) into distributions
+    and confidence intervals, using `estimate` to get the mean and the
+    interval bounds of a column of per-sample values.
+    """
+    marginals = {}
+    intervals = {}
+    for i, person in enumerate(pedigree.names):
+        column = genes[:, i]
+        marginals[person] = {}
+        intervals[person] = {"gene": {}, "trait": {}}
+        for count in GENES:
+            mean, low, high = estimate((column == count).astype(float))
+            marginals[person][count] = mean
+            intervals[person]["gene"][count] = (low, high)
+        if pedigree.traits[i] < 0:
+            mean, low, high = estimate(pedigree.trait[column, 1])
+            intervals[person]["trait"] = {True: (low, high), False: (1 - high, 1 - low)}
+        else:
+            known = bool(pedigree.traits[i])
+            intervals[person]["trait"] = {True: (float(known),) * 2, False: (float(not known),) * 2}
+    intervals = {person: intervals[person] for person in people}
+    return distributions(people, marginals), intervals
+
+
+def wilson(mean, size, z):
+    """
+    Return the Wilson score interval for a proportion `mean` estimated
+    from `size` samples.
+    """
+    center = (mean + z ** 2 / (2 * size)) / (1 + z ** 2 / size)
+    half = z * np.sqrt(mean * (1 - mean) / size + z ** 2 / (4 * size ** 2)) / (1 + z ** 2 / size)
+    return max(0.0, float(center - half)), min(1.0, float(center + half))
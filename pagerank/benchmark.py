@@ -0,0 +1,243 @@
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import pagerank
+from crawler import CACHE, crawl_edges, crawl_graph
+from edgefile import EDGES, EdgeFile
+from graph import INDEX, LinkGraph
+from power import power_iteration, streaming_iteration
+from sampling import random_surfers
+
+# Graph shapes the generator can produce
+SHAPES = ["powerlaw", "random", "chain", "clusters"]
+
+# Skew of link targets towards low page numbers in power-law graphs
+TARGET_SKEW = 3
+
+# Pages per cluster in clustered graphs, and the share of their links that
+# leave the cluster
+CLUSTER_SIZE = 100
+CLUSTER_LEAK = 0.01
+
+# L1 tolerance the iterative engines are timed at, and that of the reference
+# ranks sampling errors are measured against
+TOLERANCE = 1e-6
+REFERENCE_TOLERANCE = 1e-12
+
+# Largest corpus the dictionary-based functions are timed on
+DICT_LIMIT = 200000
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark pagerank crawling, ranking engines and sampling accuracy."
+    )
+    parser.add_argument("shapes", nargs="*", default=SHAPES,
+                        help=f"graph shapes: {', '.join(SHAPES)}")
+    parser.add_argument("--pages", type=int, default=10000, help="pages per generated corpus")
+    parser.add_argument("--links", type=float, default=8, help="mean links per page")
+    parser.add_argument("--edges-only", action="store_true",
+                        help="write edge files only, skipping HTML pages and crawl timings")
+    parser.add_argument("--samples", type=int, nargs="+",
+                        default=[1000, 10000, 100000, 1000000],
+                        help="sample counts to measure the accuracy of sampling at")
+    parser.add_argument("--repeats", type=int, default=3, help="seeded runs per sample count")
+    parser.add_argument("--target", type=float, default=0.05,
+                        help="L1 error that sampling has to meet")
+    parser.add_argument("--damping", type=float, default=pagerank.DAMPING, help="damping factor")
+    parser.add_argument("--seed", type=int, default=0, help="seed for corpus generation")
+    parser.add_argument("--data", help="directory to keep generated corpora in (default: temporary)")
+    parser.add_argument("--output", default="benchmark.json", help="JSON file for the results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporary:
+        data = args.data or temporary
+        results = []
+        for shape in args.shapes:
+            if shape not in SHAPES:
+                sys.exit(f"Unknown shape: {shape}")
+            directory = os.path.join(data, f"{shape}-{args.pages}-{args.seed}")
+            if not os.path.exists(os.path.join(directory, EDGES)):
+                print(f"Generating {shape} corpus ({args.pages} pages)...", file=sys.stderr)
+                generate(directory, shape, args.pages, args.links, args.seed, not args.edges_only)
+
+            # A spawned worker per corpus keeps earlier corpora out of its peak RSS
+            print(f"Benchmarking {shape}...", file=sys.stderr)
+            context = multiprocessing.get_context("spawn")
+            with context.Pool(1) as pool:
+                result = pool.apply(run, (directory, args.damping, args.samples, args.repeats,
+                                          args.target, not args.edges_only))
+            result["shape"] = shape
+            results.append(result)
+            report(result)
+
+    output = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "seed": args.seed,
+        "pages": args.pages,
+        "links": args.links,
+        "damping": args.damping,
+        "target": args.target,
+        "results": results
+    }
+    with open(args.output, "w") as f:
+        json.dump(output, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+def generate(directory, shape, pages, links, seed, html=True):
+    """
+    Write a corpus of `pages` pages with about `links` links each to
+    `directory`: as .html pages (if `html`) and as an edge file. Returns
+    the LinkGraph.
+
+    "random" pages link to pages picked uniformly, "powerlaw" pages to
+    pages skewed towards low numbers (so a few collect most links),
+    "chain" pages only to the next page, leaving the last one dangling,
+    and "clusters" pages mostly within their own block of `CLUSTER_SIZE`
+    pages, like sites on the web, which makes power iteration slow.
+    """
+    graph = generate_graph(shape, pages, links, seed)
+    os.makedirs(directory, exist_ok=True)
+    if html:
+        for i, page in enumerate(graph.pages):
+            targets = graph.targets[graph.offsets[i]:graph.offsets[i + 1]]
+            anchors = "".join(
+                f'<li><a href="{graph.pages[j]}">{graph.pages[j]}</a></li>' for j in targets
+            )
+            with open(os.path.join(directory, page), "w", encoding="utf-8") as f:
+                f.write(f"<!DOCTYPE html>\n<html>\n<head><title>{page}</title></head>\n"
+                        f"<body>\n<h1>{page}</h1>\n<ul>{anchors}</ul>\n</body>\n</html>\n")
+    EdgeFile.from_graph(os.path.join(directory, EDGES), graph)
+    return graph
+
+
+def generate_graph(shape, pages, links, seed):
+    """
+    Return a LinkGraph of the given shape, as described in `generate`.
+    """
+    rng = np.random.default_rng(seed)
+    if shape == "chain":
+        sources = np.arange(pages - 1, dtype=INDEX)
+        targets = sources + 1
+    else:
+        sources = np.repeat(np.arange(pages, dtype=INDEX), rng.poisson(links, pages))
+        if shape == "random":
+            targets = rng.integers(pages, size=sources.size)
+        elif shape == "clusters":
+            first = sources // CLUSTER_SIZE * CLUSTER_SIZE
+            targets = first + rng.integers(np.minimum(CLUSTER_SIZE, pages - first))
+            leaving = rng.random(sources.size) < CLUSTER_LEAK
+            targets[leaving] = rng.integers(pages, size=leaving.sum())
+        else:
+            targets = (pages * rng.random(sources.size) ** TARGET_SKEW).astype(INDEX)
+
+    # Drop self-links and duplicates, as crawling would
+    keys = np.unique(sources[sources != targets] * pages + targets[sources != targets])
+    offsets = np.zeros(pages + 1, dtype=INDEX)
+    np.cumsum(np.bincount(keys // pages, minlength=pages), out=offsets[1:])
+    width = len(str(max(pages - 1, 0)))
+    names = [f"{i:0{width}d}.html" for i in range(pages)]
+    return LinkGraph(names, offsets, keys % pages)
+
+
+def run(directory, damping, samples, repeats, target, html=True):
+    """
+    Time crawling and every ranking engine on the corpus in `directory`
+    (iterative engines run to an L1 change below `TOLERANCE`), and measure
+    the L1 error of sampling against iteration for each count in
+    `samples`. Returns a dictionary of measurements.
+    """
+    result = {"timings": {}, "sweeps": {}}
+    timings = result["timings"]
+
+    def timed(name, function, *args, **kwargs):
+        start = time.perf_counter()
+        value = function(*args, **kwargs)
+        timings[name] = time.perf_counter() - start
+        return value
+
+    if html:
+        cache = os.path.join(directory, CACHE)
+        if os.path.exists(cache):
+            os.remove(cache)
+        graph = timed("crawl", crawl_graph, directory)
+        timed("crawl_cached", crawl_graph, directory)
+        edges = timed("crawl_edges", crawl_edges, directory, os.path.join(directory, EDGES))
+    else:
+        edges = EdgeFile(os.path.join(directory, EDGES))
+        graph = LinkGraph(edges.pages, np.asarray(edges.offsets), np.asarray(edges.targets))
+    result["pages"] = len(graph)
+    result["links"] = len(graph.targets)
+    result["dangling"] = int(graph.dangling().sum())
+
+    if len(graph) <= DICT_LIMIT:
+        corpus = graph.to_corpus()
+        timed("sample_pagerank", pagerank.sample_pagerank, corpus, damping, pagerank.SAMPLES)
+        timed("iterate_pagerank", pagerank.iterate_pagerank, corpus, damping)
+
+    engines = {
+        "jacobi": {},
+        "gauss_seidel": {"method": "gauss-seidel"},
+        "aitken": {"extrapolation": "aitken"},
+        "quadratic": {"extrapolation": "quadratic"}
+    }
+    for name, options in engines.items():
+        residuals = []
+        timed(name, power_iteration, graph, damping, TOLERANCE, residuals=residuals, norm="l1",
+              **options)
+        result["sweeps"][name] = len(residuals)
+    residuals = []
+    timed("streaming", streaming_iteration, edges, damping, TOLERANCE, residuals=residuals,
+          norm="l1")
+    result["sweeps"]["streaming"] = len(residuals)
+    timed("sampling", random_surfers, graph, damping, pagerank.SAMPLES, seed=0)
+
+    # Sampling error against a tightly converged reference
+    reference = power_iteration(graph, damping, REFERENCE_TOLERANCE, norm="l1", max_iter=10000)
+    result["accuracy"] = []
+    for n in samples:
+        errors = []
+        start = time.perf_counter()
+        for seed in range(repeats):
+            estimate = random_surfers(graph, damping, n, seed=seed)
+            errors.append(float(np.abs(estimate - reference).sum()))
+        result["accuracy"].append({
+            "samples": n,
+            "l1_mean": float(np.mean(errors)),
+            "l1_max": max(errors),
+            "seconds": (time.perf_counter() - start) / repeats
+        })
+    meeting = [entry["samples"] for entry in result["accuracy"] if entry["l1_max"] <= target]
+    result["cheapest_samples"] = min(meeting) if meeting else None
+
+    result["peak_rss_mb"] = pagerank.peak_rss_mb()
+    return result
+
+
+def report(result):
+    print(f"{result['shape']}: {result['pages']} pages, {result['links']} links, "
+          f"{result['dangling']} dangling, peak RSS {result['peak_rss_mb']:.0f} MB")
+    for name, seconds in result["timings"].items():
+        sweeps = result["sweeps"].get(name)
+        detail = f" ({sweeps} sweeps)" if sweeps is not None else ""
+        print(f"  {name}: {seconds * 1000:.1f}ms{detail}")
+    for entry in result["accuracy"]:
+        print(f"  {entry['samples']} samples: L1 error {entry['l1_mean']:.4f} "
+              f"(max {entry['l1_max']:.4f}), {entry['seconds'] * 1000:.1f}ms")
+    cheapest = result["cheapest_samples"]
+    print(f"  cheapest SAMPLES meeting the target: {cheapest if cheapest else 'none measured'}")
+
+
+if __name__ == "__main__":
+    main()
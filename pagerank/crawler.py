@@ -0,0 +1,314 @@
+import codecs
+import hashlib
+import os
+import posixpath
+import re
+import time
+import zipfile
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from edgefile import EdgeFile
+from graph import INDEX, LinkGraph
+
+# Same link pattern `crawl` has always used, and links that are already
+# plain file names
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+SIMPLE = re.compile(r"[^/#?:.\s][^/#?:\s]*")
+
+# Bytes read from a page at a time, and the longest unfinished tag (in
+# characters) carried over from one block to the next
+BLOCK = 64 * 1024
+MAX_TAG = 64 * 1024
+
+# Pages handed to a worker process at a time, and how often progress is reported
+BATCH = 256
+PROGRESS_EVERY = 10000
+
+# File in each corpus directory that its crawled links are cached in
+CACHE = "pagerank.cache"
+CACHE_VERSION = 1
+
+# Size in bytes of the content hash kept for every page
+DIGEST_SIZE = 16
+
+
+def crawl_graph(directory, workers=None, progress=None, cache=True):
+    """
+    Crawl every .html page in `directory` into a LinkGraph.
+
+    Pages are parsed by a pool of `workers` processes (one per CPU by
+    default, no pool for 1), each streaming its files in blocks rather
+    than reading them whole. Links are normalized relative to their page,
+    and only links to other pages in the corpus are kept. `progress`, if
+    given, is called with the pages read so far, the number that need
+    reading and the throughput in pages per second.
+
+    With `cache`, the links of every page are kept in `CACHE` inside
+    `directory` with the page's modification time, size and content hash.
+    Later crawls only read pages that are new or whose time or size
+    changed, and only re-parse those whose hash changed too; removed pages
+    are dropped. The graph's `stats` count the pages in each case.
+    """
+    started = time.time_ns()
+    entries = list_pages(directory)
+    pages = [entry.name for entry in entries]
+    stamps = [(stat.st_mtime_ns, stat.st_size) for stat in (entry.stat() for entry in entries)]
+    path = os.path.join(directory, CACHE)
+    written, cached = read_cache(path) if cache else (0, {})
+
+    # Trust cached links of pages untouched since the cache was written;
+    # pages modified while it was being written have to be checked again
+    links = [None] * len(pages)
+    digests = [None] * len(pages)
+    stale = []
+    for i, page in enumerate(pages):
+        entry = cached.get(page)
+        if entry is not None and entry[0] == stamps[i] and stamps[i][0] < written:
+            digests[i], links[i] = entry[1], entry[2]
+        else:
+            stale.append(i)
+
+    stats = {
+        "pages": len(pages),
+        "cached": len(pages) - len(stale),
+        "unchanged": 0,
+        "parsed": 0,
+        "removed": len(cached.keys() - set(pages))
+    }
+    paths = [os.path.join(directory, pages[i]) for i in stale]
+    known = [cached[pages[i]][1] if pages[i] in cached else None for i in stale]
+    for (digest, found), i in zip(read_pages(paths, known, workers, progress), stale):
+        digests[i] = digest
+        if found is None:
+            links[i] = cached[pages[i]][2]
+            stats["unchanged"] += 1
+        else:
+            links[i] = found
+            stats["parsed"] += 1
+
+    if cache and (stale or stats["removed"]):
+        try:
+            write_cache(path, started, pages, stamps, digests, links)
+        except OSError:
+            pass
+
+    index = {page: i for i, page in enumerate(pages)}
+    offsets = array("q", [0])
+    targets = array("q")
+    for found in links:
+        targets.extend(sorted([index[link] for link in found if link in index]))
+        offsets.append(len(targets))
+    graph = LinkGraph(
+        pages,
+        np.frombuffer(offsets, dtype=INDEX).copy(),
+        np.frombuffer(targets, dtype=INDEX).copy()
+    )
+    graph.stats = stats
+    return graph
+
+
+def crawl_edges(directory, path, workers=None, progress=None):
+    """
+    Crawl every .html page in `directory` straight into an EdgeFile at
+    `path`, writing each page's links to disk as soon as it is parsed, so
+    only the page names are ever held in memory. `workers` and `progress`
+    are as for `crawl_graph`; the link cache is not used.
+    """
+    pages = [entry.name for entry in list_pages(directory)]
+    index = {page: i for i, page in enumerate(pages)}
+    paths = [os.path.join(directory, page) for page in pages]
+    results = read_pages(paths, [None] * len(pages), workers, progress)
+    return EdgeFile.write(
+        path, pages,
+        (sorted([index[link] for link in found if link in index]) for _, found in results)
+    )
+
+
+def list_pages(directory):
+    """
+    Return the directory entries of the .html pages in `directory`, sorted
+    by name.
+    """
+    return sorted(
+        (entry for entry in os.scandir(directory)
+         if entry.name.endswith(".html") and entry.is_file()),
+        key=lambda entry: entry.name
+    )
+
+
+def read_pages(paths, known, workers=None, progress=None):
+    """
+    Yield `read_page` of every path in `paths` with its `known` digest, in
+    order, using a pool of `workers` processes for more than a batch of
+    pages. `progress` is called as described in `crawl_graph`.
+    """
+    start = time.perf_counter()
+
+    def report(done):
+        if progress is not None:
+            elapsed = time.perf_counter() - start
+            progress(done, len(paths), done / elapsed if elapsed > 0 else 0.0)
+
+    workers = workers or os.cpu_count() or 1
+    executor = ProcessPoolExecutor(workers) if workers > 1 and len(paths) > BATCH else None
+    try:
+        if executor is None:
+            results = map(read_page, paths, known)
+        else:
+            results = executor.map(read_page, paths, known, chunksize=BATCH)
+        for done, result in enumerate(results, 1):
+            yield result
+            if done % PROGRESS_EVERY == 0:
+                report(done)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    report(len(paths))
+
+
+def read_cache(path):
+    """
+    Return the time the cache at `path` was written and a dictionary
+    mapping each page to its (mtime, size), content hash and links, or
+    (0, {}) if there is no usable cache.
+    """
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            if int(data["version"]) != CACHE_VERSION:
+                return 0, {}
+            written = int(data["written"])
+            pages = data["pages"].tolist()
+            mtimes = data["mtimes"].tolist()
+            sizes = data["sizes"].tolist()
+            digests = data["digests"]
+            names = data["names"].tolist()
+            offsets = data["offsets"].tolist()
+            targets = data["targets"].tolist()
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        return 0, {}
+
+    cached = {}
+    for i, page in enumerate(pages):
+        links = {names[j] for j in targets[offsets[i]:offsets[i + 1]]}
+        cached[page] = ((mtimes[i], sizes[i]), digests[i].tobytes(), links)
+    return written, cached
+
+
+def write_cache(path, written, pages, stamps, digests, links):
+    """
+    Write the crawled `links` of every page, with its (mtime, size) stamp
+    and content digest, to the cache at `path`. Links are stored by name,
+    so links to pages that don't exist yet still count once they appear.
+    """
+    names = sorted(set().union(*links))
+    index = {name: i for i, name in enumerate(names)}
+    offsets = array("q", [0])
+    targets = array("q")
+    for found in links:
+        targets.extend(index[link] for link in found)
+        offsets.append(len(targets))
+
+    # Write next to the old cache and swap it in, so a crash never leaves
+    # a half-written file behind
+    temporary = f"{path}.tmp"
+    with open(temporary, "wb") as f:
+        np.savez(
+            f,
+            version=np.array(CACHE_VERSION),
+            written=np.array(written, dtype=np.int64),
+            pages=np.array(pages, dtype=str),
+            mtimes=np.array([stamp[0] for stamp in stamps], dtype=np.int64),
+            sizes=np.array([stamp[1] for stamp in stamps], dtype=np.int64),
+            digests=np.frombuffer(b"".join(digests), dtype=np.uint8).reshape(-1, DIGEST_SIZE),
+            names=np.array(names, dtype=str),
+            offsets=np.frombuffer(offsets, dtype=np.int64),
+            targets=np.frombuffer(targets, dtype=np.int64)
+        )
+    os.replace(temporary, path)
+
+
+def read_page(path, digest=None):
+    """
+    Return the content hash of the page at `path` and its links, or None
+    for the links if its hash is still `digest`.
+    """
+    if digest is not None:
+        current = hashlib.blake2b(digest_size=DIGEST_SIZE)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(BLOCK), b""):
+                current.update(block)
+        if current.digest() == digest:
+            return digest, None
+    current = hashlib.blake2b(digest_size=DIGEST_SIZE)
+    links = page_links(path, current)
+    return current.digest(), links
+
+
+def page_links(path, digest=None):
+    """
+    Return the normalized links of the page at `path`, except to itself.
+    The page's bytes are fed to the hash object `digest`, if given.
+    """
+    page = os.path.basename(path)
+    links = {normalize(link, page) for link in extract_links(path, digest)}
+    links.discard(None)
+    links.discard(page)
+    return links
+
+
+def extract_links(path, digest=None):
+    """
+    Return the set of href values of every <a> tag in the file at `path`,
+    reading it in blocks so whole documents are never held in memory.
+    The raw bytes are fed to the hash object `digest`, if given.
+    """
+    with open(path, "rb") as f:
+        data = f.read(BLOCK)
+        if digest is not None:
+            digest.update(data)
+        if len(data) < BLOCK:
+            # The whole page fit in one block
+            return set(LINK.findall(data.decode("utf-8", "replace")))
+
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        text = decoder.decode(data)
+        links = set()
+        while True:
+            # Hold back a trailing tag that hasn't been closed yet
+            cut = text.rfind("<")
+            if cut == -1 or text.find(">", cut) != -1:
+                cut = len(text)
+            links.update(LINK.findall(text, 0, cut))
+            carry = text[cut:]
+            if len(carry) > MAX_TAG:
+                carry = ""
+            data = f.read(BLOCK)
+            if not data:
+                break
+            if digest is not None:
+                digest.update(data)
+            text = carry + decoder.decode(data)
+    links.update(LINK.findall(carry + decoder.decode(b"", final=True)))
+    return links
+
+
+def normalize(link, page):
+    """
+    Resolve `link` relative to `page` into a corpus path, dropping any
+    query or fragment. Returns None for external, absolute or empty links.
+    """
+    # Plain file names next to the page need no resolving
+    if SIMPLE.fullmatch(link) and "/" not in page:
+        return link
+    link = link.split("#", 1)[0].split("?", 1)[0].strip()
+    if not link or link.startswith("/") or ":" in link:
+        return None
+    if "/" in page:
+        link = posixpath.join(posixpath.dirname(page), link)
+    link = posixpath.normpath(link)
+    if link == "." or link.startswith("../"):
+        return None
+    return link
@@ -0,0 +1,108 @@
+import os
+from array import array
+
+import numpy as np
+
+from graph import INDEX
+
+# Edge file directory written inside a corpus by default
+EDGES = "pagerank.edges"
+
+# Files an edge file directory is made of: page names one per line, the
+# N + 1 link offsets of the pages, and the raw link targets sorted by source
+PAGES = "pages.txt"
+OFFSETS = "offsets.npy"
+TARGETS = "targets.bin"
+
+# Links buffered in memory while writing, and streamed per block while ranking
+WRITE_BUFFER = 1 << 20
+BLOCK_LINKS = 1 << 22
+
+
+class EdgeFile():
+    """
+    Link graph kept on disk, for corpora whose links don't fit in memory.
+
+    The layout matches LinkGraph's CSR arrays: the links of page `i` are
+    `targets[offsets[i]:offsets[i + 1]]`. Page names and offsets (one
+    entry per page) are loaded into memory, while the targets (one entry
+    per link) stay in a memory-mapped file that is read block by block.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, PAGES), encoding="utf-8") as f:
+            self.pages = f.read().splitlines()
+        self.offsets = np.load(os.path.join(path, OFFSETS))
+        if self.offsets[-1] > 0:
+            self.targets = np.memmap(os.path.join(path, TARGETS), dtype=INDEX, mode="r")
+        else:
+            # An empty file can't be memory-mapped
+            self.targets = np.zeros(0, dtype=INDEX)
+
+    @classmethod
+    def write(cls, path, pages, links):
+        """
+        Write an edge file to the directory `path`, given the page names in
+        order and an iterable with the sorted target indices of every page.
+        Links are streamed to disk, so `links` can be a generator.
+        """
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, PAGES), "w", encoding="utf-8") as f:
+            for page in pages:
+                f.write(f"{page}\n")
+
+        offsets = array("q", [0])
+        total = 0
+        buffer = array("q")
+        with open(os.path.join(path, TARGETS), "wb") as f:
+            for targets in links:
+                buffer.extend(targets)
+                total += len(targets)
+                offsets.append(total)
+                if len(buffer) >= WRITE_BUFFER:
+                    f.write(buffer.tobytes())
+                    buffer = array("q")
+            f.write(buffer.tobytes())
+        np.save(os.path.join(path, OFFSETS), np.frombuffer(offsets, dtype=INDEX))
+        return cls(path)
+
+    @classmethod
+    def from_graph(cls, path, graph):
+        """
+        Write a LinkGraph to an edge file at `path`.
+        """
+        return cls.write(path, graph.pages, (
+            graph.targets[graph.offsets[i]:graph.offsets[i + 1]] for i in range(len(graph))
+        ))
+
+    def __len__(self):
+        return len(self.pages)
+
+    def out_degrees(self):
+        return np.diff(self.offsets)
+
+    def dangling(self):
+        """
+        Return a boolean mask of the pages without any outgoing links.
+        """
+        return self.out_degrees() == 0
+
+    def blocks(self, size=BLOCK_LINKS):
+        """
+        Yield (first, last) ranges of source pages covering all pages, each
+        holding about `size` links (a single page with more links gets a
+        block of its own).
+        """
+        first = 0
+        while first < len(self):
+            last = int(np.searchsorted(self.offsets, self.offsets[first] + size, side="right")) - 1
+            last = min(max(last, first + 1), len(self))
+            yield first, last
+            first = last
+
+    def to_dict(self, values):
+        """
+        Return a dictionary mapping each page name to its entry in `values`.
+        """
+        return dict(zip(self.pages, values.tolist()))
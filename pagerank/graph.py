@@ -0,0 +1,143 @@
+import numpy as np
+import scipy.sparse
+
+# Integer type for page indices and link offsets
+INDEX = np.int64
+
+
+class LinkGraph():
+    """
+    Link graph with pages numbered 0..N-1 (in sorted name order) and the
+    outgoing links of every page stored in CSR form: the links of page `i`
+    are `targets[offsets[i]:offsets[i + 1]]`.
+    """
+
+    def __init__(self, pages, offsets, targets):
+        self.pages = pages
+        self.offsets = offsets
+        self.targets = targets
+        self.index = {page: i for i, page in enumerate(pages)}
+
+        # Page counts from the crawl that built the graph, if any
+        self.stats = {}
+
+    @classmethod
+    def from_corpus(cls, corpus):
+        """
+        Build a graph from a `crawl`-style dictionary mapping each page to
+        the pages it links to. Links to pages outside the corpus are ignored.
+        The corpus itself is left untouched.
+        """
+        pages = sorted(corpus)
+        index = {page: i for i, page in enumerate(pages)}
+        offsets = np.zeros(len(pages) + 1, dtype=INDEX)
+        targets = []
+        for i, page in enumerate(pages):
+            links = sorted(index[link] for link in set(corpus[page]) if link in index)
+            targets.extend(links)
+            offsets[i + 1] = len(targets)
+        return cls(pages, offsets, np.array(targets, dtype=INDEX))
+
+    def __len__(self):
+        return len(self.pages)
+
+    def out_degrees(self):
+        return np.diff(self.offsets)
+
+    def dangling(self):
+        """
+        Return a boolean mask of the pages without any outgoing links.
+        """
+        return self.out_degrees() == 0
+
+    def sources(self):
+        """
+        Return the source page of every link, parallel to `targets`.
+        """
+        return np.repeat(np.arange(len(self), dtype=INDEX), self.out_degrees())
+
+    def transition_matrix(self):
+        """
+        Return the sparse N x N matrix M with M[j, i] = 1 / outlinks(i) for
+        every link i -> j, so `M @ ranks` spreads each page's rank evenly
+        over its links. Columns of dangling pages are all zero.
+        """
+        n = len(self)
+        degrees = self.out_degrees()
+        sources = self.sources()
+        weights = 1 / degrees[sources]
+        return scipy.sparse.csr_matrix((weights, (self.targets, sources)), shape=(n, n))
+
+    def edit(self, add_pages=(), remove_pages=(), add_links=(), remove_links=()):
+        """
+        Return a new graph with `add_pages` added, `remove_pages` (and all
+        their links) removed, and the (source, target) page pairs in
+        `add_links` and `remove_links` linked and unlinked. As in
+        `from_corpus`, links to pages outside the graph are ignored and
+        links from a page to itself are kept, so they can be added and
+        removed like any other link.
+
+        Also returns, for every page of the new graph, its index in this
+        graph or -1 if it is new.
+        """
+        removed = set(remove_pages)
+        pages = sorted((set(self.pages) - removed) | set(add_pages))
+        index = {page: i for i, page in enumerate(pages)}
+        previous = np.array([self.index.get(page, -1) for page in pages], dtype=INDEX)
+
+        # Renumber the existing links, dropping those of removed pages
+        renumber = np.full(len(self), -1, dtype=INDEX)
+        kept = previous >= 0
+        renumber[previous[kept]] = np.flatnonzero(kept)
+        sources = renumber[self.sources()]
+        targets = renumber[self.targets]
+        keep = (sources >= 0) & (targets >= 0)
+
+        # Links are handled as single source * size + target keys
+        size = max(len(pages), 1)
+        keys = sources[keep] * size + targets[keep]
+
+        def link_keys(links):
+            found = [
+                index[source] * size + index[target] for source, target in links
+                if source in index and target in index
+            ]
+            return np.array(found, dtype=INDEX)
+
+        keys = keys[~np.isin(keys, link_keys(remove_links))]
+        keys = np.union1d(keys, link_keys(add_links))
+        offsets = np.zeros(len(pages) + 1, dtype=INDEX)
+        np.cumsum(np.bincount(keys // size, minlength=len(pages)), out=offsets[1:])
+        return LinkGraph(pages, offsets, keys % size), previous
+
+    def teleports(self, seed_sets):
+        """
+        Return an N x K matrix whose k-th column is the uniform distribution
+        over the pages in the k-th of `seed_sets`.
+        """
+        matrix = np.zeros((len(self), len(seed_sets)))
+        for k, seeds in enumerate(seed_sets):
+            seeds = set(seeds)
+            if not seeds:
+                raise ValueError(f"seed set {k} is empty")
+            unknown = seeds - self.index.keys()
+            if unknown:
+                raise ValueError(f"unknown seed pages: {', '.join(sorted(unknown))}")
+            matrix[[self.index[page] for page in seeds], k] = 1 / len(seeds)
+        return matrix
+
+    def to_corpus(self):
+        """
+        Return the graph as a `crawl`-style dictionary mapping each page to
+        the set of pages it links to.
+        """
+        return {
+            page: {self.pages[j] for j in self.targets[self.offsets[i]:self.offsets[i + 1]]}
+            for i, page in enumerate(self.pages)
+        }
+
+    def to_dict(self, values):
+        """
+        Return a dictionary mapping each page name to its entry in `values`.
+        """
+        return dict(zip(self.pages, values.tolist()))
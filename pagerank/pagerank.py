@@ -1,24 +1,140 @@
+import argparse
+import csv
+import heapq
 import os
-import random
-import re
+import resource
 import sys
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+from crawler import crawl_edges, crawl_graph
+from edgefile import EDGES
+from graph import LinkGraph
+from power import CONVERGENCE, personalized_iteration, power_iteration, streaming_iteration
+from sampling import random_surfers
 
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Pages per batch of rows when writing ranks to CSV
+WRITE_CHUNK = 65536
+
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
-    for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
-    print(f"PageRank Results from Iteration")
-    for page in sorted(ranks):
-        print(f"  {page}: {ranks[page]:.4f}")
+    parser = argparse.ArgumentParser(description="Rank the pages of an HTML corpus by PageRank.")
+    parser.add_argument("corpus", help="directory of .html pages")
+    parser.add_argument("--method", choices=["sample", "iterate", "both"], default="both",
+                        help="how to compute PageRank (default: both)")
+    parser.add_argument("--samples", type=int, default=SAMPLES, help="samples for --method sample")
+    parser.add_argument("--damping", type=float, default=DAMPING, help="damping factor")
+    parser.add_argument("--seed", type=int, help="seed for sampling")
+    parser.add_argument("--tolerance", type=float, default=CONVERGENCE,
+                        help="stop iterating once the change between sweeps is below this "
+                             f"(default: {CONVERGENCE})")
+    parser.add_argument("--norm", choices=["max", "l1"], default="max",
+                        help="measure that change as the largest change of any page, or as "
+                             "the sum of all changes (default: max)")
+    parser.add_argument("--max-iter", type=int, help="stop iterating after this many sweeps")
+    parser.add_argument("--top", type=int, help="print only the K highest ranked pages")
+    parser.add_argument("--output", help="also write all ranks to OUTPUT-<method>.<format>")
+    parser.add_argument("--format", choices=["csv", "npy"], default="csv",
+                        help="file format for --output (default: csv)")
+    parser.add_argument("--disk", action="store_true",
+                        help="keep the links on disk instead of in memory")
+    parser.add_argument("--workers", type=int, help="processes used to parse pages")
+    args = parser.parse_args()
+
+    with stage("crawl"):
+        if args.disk:
+            graph = crawl_edges(args.corpus, os.path.join(args.corpus, EDGES), args.workers,
+                                progress=crawl_progress)
+        else:
+            graph = crawl_graph(args.corpus, args.workers, progress=crawl_progress)
+
+    methods = ["sample", "iterate"] if args.method == "both" else [args.method]
+    for method in methods:
+        with stage(method):
+            if method == "sample":
+                ranks = random_surfers(graph, args.damping, args.samples, seed=args.seed)
+            elif args.disk:
+                ranks = streaming_iteration(graph, args.damping, args.tolerance,
+                                            max_iter=args.max_iter, norm=args.norm)
+            else:
+                ranks = power_iteration(graph, args.damping, args.tolerance, norm=args.norm,
+                                        max_iter=args.max_iter)
+
+        with stage(f"{method} output"):
+            if method == "sample":
+                print(f"PageRank Results from Sampling (n = {args.samples})")
+            else:
+                print(f"PageRank Results from Iteration")
+            if args.top is None:
+                indices = range(len(graph))
+            else:
+                indices = top_pages(ranks, args.top)
+            for i in indices:
+                print(f"  {graph.pages[i]}: {ranks[i]:.4f}")
+            if args.output:
+                write_ranks(f"{args.output}-{method}.{args.format}", graph.pages, ranks, args.format)
+
+
+@contextmanager
+def stage(name):
+    """
+    Report the time taken by the enclosed stage, and the peak memory use
+    so far, on standard error.
+    """
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    print(f"{name}: {elapsed:.3f}s, peak RSS {peak_rss_mb():.0f} MB", file=sys.stderr)
+
+
+def crawl_progress(done, total, rate):
+    """
+    Report the pages read so far and the crawl's throughput on standard
+    error, as `crawl_graph`'s `progress` callback.
+    """
+    if total:
+        print(f"crawl: {done}/{total} pages, {rate:.0f} pages/s", file=sys.stderr)
+
+
+def peak_rss_mb():
+    """
+    Return the peak resident memory of this process so far, in megabytes.
+    """
+    # ru_maxrss is in kilobytes on Linux but bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def top_pages(ranks, k):
+    """
+    Return the indices of the `k` highest `ranks`, highest first, picked
+    with a heap of size `k` instead of sorting every page. Equal ranks
+    keep page order.
+    """
+    values = ranks.tolist()
+    return heapq.nlargest(k, range(len(values)), key=values.__getitem__)
+
+
+def write_ranks(path, pages, ranks, file_format):
+    """
+    Write every page's rank to `path`, either as CSV rows of page and rank,
+    streamed `WRITE_CHUNK` pages at a time, or as a NumPy .npy array of the
+    ranks in page order.
+    """
+    if file_format == "npy":
+        np.save(path, ranks)
+        return
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["page", "rank"])
+        for start in range(0, len(pages), WRITE_CHUNK):
+            writer.writerows(zip(pages[start:start + WRITE_CHUNK],
+                                 ranks[start:start + WRITE_CHUNK].tolist()))
 
 
 def crawl(directory):
@@ -26,26 +142,11 @@ def crawl(directory):
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
-    """
-    pages = dict()
-
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
 
-    # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
-
-    return pages
+    Pages are parsed in parallel by `crawler.crawl_graph`, which caches
+    their links in the corpus directory and only re-parses changed pages.
+    """
+    return crawl_graph(directory).to_corpus()
 
 
 def transition_model(corpus, page, damping_factor):
@@ -80,7 +181,7 @@ def transition_model(corpus, page, damping_factor):
     return result
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, seed=None):
     """
     Return PageRank values for each page by sampling `n` pages
     according to transition model, starting with a page at random.
@@ -88,29 +189,16 @@ def sample_pagerank(corpus, damping_factor, n):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    The samples come from many random surfers simulated side by side over
+    the compiled link graph; pass `seed` for reproducible results.
     """
-    # Init the dict of ranks
-    result = dict()
-    for page in corpus:
-        result[page] = 0.0
-
-    counter = n
-    while counter != 0:
-        if counter == n:
-            # First sample, choosing a random page
-            current_page = random.choice(list(corpus))
-            result[current_page] += (1/n)
-            model = transition_model(corpus, current_page, damping_factor)
-        else:
-            current_page = random.choices(list(model), weights=model.values())[0]
-            result[current_page] += (1/n)
-            model = transition_model(corpus, current_page, damping_factor)
-        counter -= 1
-    
-    return result
+    graph = LinkGraph.from_corpus(corpus)
+    return graph.to_dict(random_surfers(graph, damping_factor, n, seed=seed))
 
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, converge=CONVERGENCE, norm="max", max_iter=None,
+                     method="jacobi", extrapolation=None, residuals=None):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -118,49 +206,49 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
-    """
-    result = dict()
-    N = len(corpus)
-    converge = 0.001
-
-    # If page has no links
-    for page in corpus:
-        if not corpus[page]:
-            corpus[page] = list(corpus.keys())
 
-    # Init the resulting dictionary
-    for page in corpus:
-        result[page] = (1/N)
-    
-    # do while pages_done != N
-    while True:
-
-        pages_done = 0
+    The corpus is compiled once into a sparse transition matrix and ranked
+    by vectorized power iteration; `corpus` itself is not modified. By
+    default iteration stops once no value changes by more than 0.001;
+    the other arguments are passed on to `power.power_iteration`, and the
+    change of every sweep is appended to `residuals` if it is a list.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    ranks = power_iteration(graph, damping_factor, converge, residuals=residuals, norm=norm,
+                            max_iter=max_iter, method=method, extrapolation=extrapolation)
+    return graph.to_dict(ranks)
 
-        for current_page in corpus:
-            # ∑(PR(i) / NumLinks(i))
-            summa = 0
-            # Saving old value
-            old_value = result[current_page]
-            # ((1 - d)/N)
-            new_value = (1 - damping_factor) / N
 
-            for page in corpus:
-                if current_page in corpus[page]:
-                    summa += (result[page] / len(corpus[page]))
+def personalized_pagerank(corpus, damping_factor, seed_sets, converge=CONVERGENCE, max_iter=None):
+    """
+    Return topic-sensitive PageRank values for every set of seed pages in
+    `seed_sets`: the surfer jumps to a random seed page instead of a random
+    page of the corpus.
 
-            # The whole formula: ((1 - d)/N) + d * ∑(PR(i) / NumLinks(i))
-            new_value += (damping_factor * summa)
-            result[current_page] = new_value  
+    Return a list with one dictionary per seed set, mapping page names to
+    their PageRank value for that set. All K rankings are computed
+    together, with one pass over the links per iteration.
+    """
+    graph = LinkGraph.from_corpus(corpus)
+    ranks = personalized_iteration(graph, damping_factor, graph.teleports(seed_sets),
+                                   converge, max_iter)
+    return [graph.to_dict(ranks[:, k]) for k in range(ranks.shape[1])]
 
-            # Checking if value converges
-            if abs((old_value - new_value)) < converge:
-                pages_done += 1
 
-        if pages_done == N:
-            break
+def disk_pagerank(directory, damping_factor, path=None, converge=CONVERGENCE, workers=None):
+    """
+    Return PageRank values for the corpus in `directory` without ever
+    holding its links in memory.
 
-    return result
+    The corpus is crawled into an on-disk edge file at `path` (`EDGES`
+    inside the corpus by default), then ranked by power iteration that
+    streams the links from disk, so memory grows with the number of
+    pages rather than links.
+    """
+    if path is None:
+        path = os.path.join(directory, EDGES)
+    edges = crawl_edges(directory, path, workers)
+    return edges.to_dict(streaming_iteration(edges, damping_factor, converge))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,267 @@
+import numpy as np
+import scipy.sparse
+import scipy.sparse.linalg
+
+# Stop once no page's rank changes by more than this between sweeps
+CONVERGENCE = 0.001
+
+# Iterates each extrapolation method needs
+EXTRAPOLATION_HISTORY = {"aitken": 3, "quadratic": 4}
+
+# Extrapolate only once successive residual ratios differ by less than this,
+# i.e. once the error is dominated by a single eigenvalue
+RATIO_SETTLED = 0.02
+
+# and only while that ratio is above this: faster convergence leaves
+# nothing for extrapolation to save
+RATIO_SLOW = 0.5
+
+
+def power_iteration(graph, damping_factor, converge=CONVERGENCE, start=None, residuals=None,
+                    norm="max", max_iter=None, method="jacobi", extrapolation=None):
+    """
+    Compute PageRank over a LinkGraph by power iteration.
+
+    Each sweep applies
+        PR = (1 - d) / N + d * (M @ PR + dangling mass / N)
+    where M is the sparse transition matrix and the rank held by pages
+    without links is spread evenly over every page, as if they linked to
+    the whole corpus. Returns the rank vector once no entry changes by
+    more than `converge`, or, with `norm` "l1", once the changes add up
+    to less than `converge`. At most `max_iter` sweeps are run if given.
+
+    With `method` "jacobi" every sweep uses only the previous ranks; with
+    "gauss-seidel" pages are updated in order, each using the ranks just
+    computed for the pages before it (one sparse triangular solve per
+    sweep). `extrapolation` "aitken" or "quadratic" replaces the ranks by
+    an estimate of their limit made from the last few iterates, once the
+    ratio between successive residuals has settled (as in Kamvar et al.).
+    An estimate is kept only if the sweep from it changes less than a
+    plain sweep would have; otherwise iteration goes on from the ranks it
+    replaced, without extrapolating again. An estimate that isn't a valid
+    distribution is skipped until the next few iterates are in. Every
+    sweep, rejected or not, counts towards `max_iter`.
+
+    Iteration starts from the uniform distribution, or from the rank
+    vector `start` if given. If `residuals` is a list, the change of
+    every sweep (in the chosen norm) is appended to it.
+    """
+    if norm not in ["max", "l1"]:
+        raise ValueError(f"unknown norm: {norm}")
+    if extrapolation is not None and extrapolation not in EXTRAPOLATION_HISTORY:
+        raise ValueError(f"unknown extrapolation: {extrapolation}")
+    n = len(graph)
+    if n == 0:
+        return np.zeros(0)
+    if method == "jacobi":
+        step = jacobi(graph, damping_factor)
+    elif method == "gauss-seidel":
+        step = gauss_seidel(graph, damping_factor)
+    else:
+        raise ValueError(f"unknown method: {method}")
+
+    ranks = np.full(n, 1 / n) if start is None else np.asarray(start, dtype=float)
+    iterates = [ranks]
+    ratios = []
+    previous = None
+    fallback = None
+    sweeps = 0
+    while max_iter is None or sweeps < max_iter:
+        new_ranks = step(ranks)
+        sweeps += 1
+        change = distance(new_ranks, ranks, norm)
+        if residuals is not None:
+            residuals.append(float(change))
+
+        # A sweep from an extrapolated estimate has to beat the plain sweep
+        # expected from the settled ratio, or the estimate is dropped
+        if fallback is not None:
+            replaced, expected = fallback
+            fallback = None
+            if change >= expected:
+                ranks = replaced
+                extrapolation = None
+                continue
+            iterates = [new_ranks]
+            ratios = []
+        else:
+            if previous is not None and previous > 0:
+                ratios.append(change / previous)
+            if extrapolation is not None:
+                iterates = iterates[-EXTRAPOLATION_HISTORY[extrapolation] + 1:] + [new_ranks]
+        previous = change
+        ranks = new_ranks
+        if change < converge:
+            break
+
+        if (extrapolation is not None and len(iterates) == EXTRAPOLATION_HISTORY[extrapolation]
+                and len(ratios) >= 2 and abs(ratios[-1] - ratios[-2]) < RATIO_SETTLED * ratios[-1]
+                and RATIO_SLOW < ratios[-1] < 1):
+            estimate = extrapolate(iterates, extrapolation)
+            if estimate is ranks:
+                iterates = [ranks]
+            else:
+                fallback = (ranks, change * ratios[-1])
+                ranks = estimate
+    return ranks
+
+
+def distance(new_ranks, ranks, norm):
+    """
+    Return the change between two rank vectors in `norm` ("max" or "l1").
+    """
+    if norm == "max":
+        return np.abs(new_ranks - ranks).max()
+    return np.abs(new_ranks - ranks).sum()
+
+
+def personalized_iteration(graph, damping_factor, teleports, converge=CONVERGENCE,
+                           max_iter=None, residuals=None):
+    """
+    Compute K personalized PageRanks over a LinkGraph at once.
+
+    `teleports` is an N x K matrix whose columns are the distributions a
+    surfer jumps to instead of the uniform one; the rank held by pages
+    without links also goes to the teleport distribution. All K rank
+    vectors are stored as the columns of one N x K matrix, so every sweep
+        PR = d * M @ PR + ((1 - d) + d * dangling mass) * teleports
+    reads the sparse transition matrix once for all of them. Returns the
+    rank matrix once no entry changes by more than `converge`, after at
+    most `max_iter` sweeps if given. If `residuals` is a list, the
+    largest change of every sweep is appended to it.
+    """
+    teleports = np.asarray(teleports, dtype=float)
+    n = len(graph)
+    if teleports.ndim != 2 or teleports.shape[0] != n:
+        raise ValueError(f"teleports must be a {n} x K matrix")
+    if n == 0 or teleports.shape[1] == 0:
+        return np.zeros(teleports.shape)
+    matrix = graph.transition_matrix()
+    dangling = graph.dangling()
+
+    ranks = teleports.copy()
+    sweeps = 0
+    while max_iter is None or sweeps < max_iter:
+        jump = (1 - damping_factor) + damping_factor * ranks[dangling].sum(axis=0)
+        new_ranks = damping_factor * (matrix @ ranks) + jump * teleports
+        sweeps += 1
+        change = np.abs(new_ranks - ranks).max()
+        ranks = new_ranks
+        if residuals is not None:
+            residuals.append(float(change))
+        if change < converge:
+            break
+    return ranks
+
+
+def streaming_iteration(edges, damping_factor, converge=CONVERGENCE, max_iter=None,
+                        residuals=None, block=None, norm="max"):
+    """
+    Compute PageRank over an on-disk EdgeFile by power iteration, with the
+    same update and stopping rules (`converge`, `norm`, `max_iter`) as
+    `power_iteration`.
+
+    Every sweep streams the memory-mapped link targets in blocks of about
+    `block` links (`edgefile.BLOCK_LINKS` by default) and adds each
+    block's contributions with a weighted bincount. Only arrays with one
+    entry per page stay in memory, never one entry per link.
+    """
+    if norm not in ["max", "l1"]:
+        raise ValueError(f"unknown norm: {norm}")
+    n = len(edges)
+    if n == 0:
+        return np.zeros(0)
+    degrees = edges.out_degrees()
+    dangling = degrees == 0
+    offsets = edges.offsets
+    blocks = list(edges.blocks() if block is None else edges.blocks(block))
+
+    ranks = np.full(n, 1 / n)
+    sweeps = 0
+    while max_iter is None or sweeps < max_iter:
+        share = ranks / np.maximum(degrees, 1)
+        spread_in = np.zeros(n)
+        for first, last in blocks:
+            targets = edges.targets[offsets[first]:offsets[last]]
+            weights = np.repeat(share[first:last], degrees[first:last])
+            spread_in += np.bincount(targets, weights=weights, minlength=n)
+        spread = (damping_factor * ranks[dangling].sum() + (1 - damping_factor)) / n
+        new_ranks = damping_factor * spread_in + spread
+        sweeps += 1
+        change = distance(new_ranks, ranks, norm)
+        ranks = new_ranks
+        if residuals is not None:
+            residuals.append(float(change))
+        if change < converge:
+            break
+    return ranks
+
+
+def jacobi(graph, damping_factor):
+    """
+    Return a function computing one Jacobi sweep from a rank vector.
+    """
+    n = len(graph)
+    matrix = graph.transition_matrix()
+    dangling = graph.dangling()
+
+    def step(ranks):
+        spread = (damping_factor * ranks[dangling].sum() + (1 - damping_factor)) / n
+        return damping_factor * (matrix @ ranks) + spread
+
+    return step
+
+
+def gauss_seidel(graph, damping_factor):
+    """
+    Return a function computing one Gauss-Seidel sweep from a rank vector:
+    with M split into its lower part L (diagonal included, for pages that
+    link to themselves) and strictly upper part U, solve
+        (I - d * L) @ PR = d * U @ PR_old + spread
+    for the new ranks, then rescale them to sum to 1.
+    """
+    n = len(graph)
+    matrix = graph.transition_matrix()
+    dangling = graph.dangling()
+    system = (scipy.sparse.identity(n, format="csr") -
+              damping_factor * scipy.sparse.tril(matrix, format="csr")).tocsr()
+    upper = scipy.sparse.triu(matrix, k=1, format="csr")
+
+    def step(ranks):
+        spread = (damping_factor * ranks[dangling].sum() + (1 - damping_factor)) / n
+        right = damping_factor * (upper @ ranks) + spread
+        new_ranks = scipy.sparse.linalg.spsolve_triangular(
+            system, right, lower=True
+        )
+        return new_ranks / new_ranks.sum()
+
+    return step
+
+
+def extrapolate(iterates, extrapolation):
+    """
+    Estimate the limit of the rank vectors in `iterates` by Aitken (page by
+    page) or quadratic extrapolation. Returns the last iterate unchanged
+    if the estimate isn't a valid distribution.
+    """
+    if extrapolation == "aitken":
+        older, old, current = iterates
+        step = current - old
+        bend = current - 2 * old + older
+        safe = np.abs(bend) > 1e-15
+        estimate = current.copy()
+        estimate[safe] -= step[safe] ** 2 / bend[safe]
+    else:
+        # Kamvar et al.: write the last iterates as the limit plus the next
+        # two eigenvectors, and solve for the limit by least squares
+        first, *rest = iterates
+        differences = np.column_stack([iterate - first for iterate in rest])
+        gamma1, gamma2 = np.linalg.lstsq(differences[:, :2], -differences[:, 2], rcond=None)[0]
+        gamma3 = 1.0
+        estimate = ((gamma1 + gamma2 + gamma3) * rest[0] +
+                    (gamma2 + gamma3) * rest[1] + gamma3 * rest[2])
+
+    total = estimate.sum()
+    if not np.isfinite(total) or total <= 0 or (estimate < 0).any():
+        return iterates[-1]
+    return estimate / total
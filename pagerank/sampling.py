@@ -0,0 +1,71 @@
+import numpy as np
+
+from graph import INDEX
+
+# Number of independent surfers walking the graph side by side; large runs
+# use one surfer per `STEPS` samples so each walks about that many steps
+SURFERS = 1000
+STEPS = 1000
+
+# Visited pages are buffered and tallied this many at a time
+TALLY = 1 << 20
+
+# Steps every surfer takes before its pages are counted, so the samples no
+# longer depend on the uniform starting pages (the error shrinks like d^steps)
+BURN_IN = 50
+
+
+def random_surfers(graph, damping_factor, n, surfers=SURFERS, seed=None, burn_in=BURN_IN):
+    """
+    Estimate PageRank over a LinkGraph from `n` samples of the random surfer
+    model, returning the fraction of samples that landed on each page.
+
+    Instead of one long walk, `surfers` independent surfers start on random
+    pages and step in lockstep as NumPy arrays, so each step draws one page
+    for every surfer at once. A surfer follows one of its page's links,
+    picked uniformly from the graph's CSR outlink arrays, with probability
+    `damping_factor`; otherwise, or when the page has no links, it jumps
+    to a page chosen uniformly from the whole corpus. Each surfer walks
+    `burn_in` steps before its samples are counted.
+
+    At least `surfers` surfers are used, more for large `n`.
+    """
+    size = len(graph)
+    if size == 0 or n <= 0:
+        return np.zeros(size)
+    rng = np.random.default_rng(seed)
+    surfers = max(1, min(n, max(surfers, n // STEPS)))
+    starts = graph.offsets[:-1]
+    degrees = graph.out_degrees()
+
+    def step(positions):
+        # Everyone jumps at random, except surfers that follow a link
+        following = np.flatnonzero(
+            (rng.random(surfers) < damping_factor) & (degrees[positions] > 0)
+        )
+        current = positions[following]
+        picks = starts[current] + (rng.random(following.size) * degrees[current]).astype(INDEX)
+        positions = rng.integers(size, size=surfers)
+        positions[following] = graph.targets[picks]
+        return positions
+
+    positions = rng.integers(size, size=surfers)
+    for _ in range(burn_in):
+        positions = step(positions)
+
+    counts = np.zeros(size, dtype=INDEX)
+    visited = []
+    buffered = 0
+    remaining = n
+    while True:
+        taken = min(surfers, remaining)
+        visited.append(positions[:taken])
+        buffered += taken
+        remaining -= taken
+        if buffered >= TALLY or remaining == 0:
+            counts += np.bincount(np.concatenate(visited), minlength=size)
+            visited = []
+            buffered = 0
+        if remaining == 0:
+            return counts / n
+        positions = step(positions)